@@ -1,37 +1,201 @@
-from django.contrib import admin
+from datetime import date
+from django.contrib import admin, messages
+from django.contrib.admin.actions import delete_selected
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Movie, Hall, Session, Ticket, Discount
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from .models import User, Movie, Hall, Session, Ticket, ArchivedTicket, SeatHold, Discount
+from .reports import local_day_range
+from .routers import read_from_replica
+from . import bulk
 
-class CustomUserAdmin(UserAdmin):
+def estimated_rows(model, using):
+    # Число строк по статистике СУБД вместо COUNT(*); None - оценки нет
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [table]
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples = -1, пока таблицу не анализировали
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+class ApproximateCountPaginator(Paginator):
+    # Точный COUNT(*) по миллионам билетов не укладывается во время запроса:
+    # без фильтров берется оценка СУБД, с фильтрами строки считаются не дальше COUNT_LIMIT
+    COUNT_LIMIT = 10000
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_rows(queryset.model, queryset.db)
+            return estimate if estimate is not None else queryset.count()
+        return queryset[:self.COUNT_LIMIT].count()
+
+class InputFilter(admin.SimpleListFilter):
+    # Фильтр с полем ввода вместо списка всех фильмов и сеансов в боковой панели
+    template = 'admin/cinema/input_filter.html'
+    
+    def lookups(self, request, model_admin):
+        # Без вариантов Django не показывает фильтр
+        return (('', ''),)
+    
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        # Остальные параметры списка (фильтры, поиск, сортировка) сохраняются, номер страницы - нет
+        all_choice['query_parts'] = [
+            (key, value) for key, value in changelist.params.items() if key not in (self.parameter_name, PAGE_VAR)
+        ]
+        yield all_choice
+
+class MovieTitleFilter(InputFilter):
+    title = 'фильму'
+    parameter_name = 'movie'
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(session__movie__title__icontains=self.value().strip())
+
+class SessionIdFilter(InputFilter):
+    title = 'номеру сеанса'
+    parameter_name = 'session'
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            try:
+                session_id = int(self.value())
+            except ValueError as e:
+                # Админка покажет список без фильтров с сообщением о неверном параметре
+                raise IncorrectLookupParameters(e)
+            return queryset.filter(session_id=session_id)
+
+class SessionDayFilter(InputFilter):
+    title = 'дате сеанса (ГГГГ-ММ-ДД)'
+    parameter_name = 'session_day'
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            try:
+                day = date.fromisoformat(self.value().strip())
+            except ValueError as e:
+                raise IncorrectLookupParameters(e)
+            range_start, range_end = local_day_range(day, day)
+            return queryset.filter(session__start_time__gte=range_start, session__start_time__lt=range_end)
+
+class ReplicaChangeListMixin:
+    # Списки объектов читаются из реплики; POST (действия над выбранными) - из основной базы
+    def changelist_view(self, request, extra_context=None):
+        if request.method not in ('GET', 'HEAD'):
+            return super().changelist_view(request, extra_context)
+        with read_from_replica(request):
+            response = super().changelist_view(request, extra_context)
+            # TemplateResponse рендерится позже, а запросы списка ленивые
+            return response.render() if hasattr(response, 'render') else response
+
+class CustomUserAdmin(ReplicaChangeListMixin, UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'phone', 'is_staff')
     fieldsets = UserAdmin.fieldsets + (
         ('Дополнительная информация', {'fields': ('phone', 'birth_date')}),
     )
 
-class MovieAdmin(admin.ModelAdmin):
+class MovieAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('title', 'genre', 'director', 'release_date', 'age_rating')
     list_filter = ('genre', 'age_rating')
     search_fields = ('title', 'director')
 
-class HallAdmin(admin.ModelAdmin):
+class HallAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('name', 'seats_rows', 'seats_per_row', 'total_seats')
     
     def total_seats(self, obj):
         return obj.total_seats
     total_seats.short_description = 'Всего мест'
 
-class SessionAdmin(admin.ModelAdmin):
+class SessionAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('movie', 'hall', 'start_time', 'end_time', 'base_price')
     list_filter = ('hall', 'start_time')
+    list_select_related = ('movie', 'hall')
     search_fields = ('movie__title',)
     date_hierarchy = 'start_time'
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
 
-class TicketAdmin(admin.ModelAdmin):
+class TicketAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('session', 'user', 'row', 'seat', 'price', 'purchase_time', 'is_paid')
-    list_filter = ('is_paid', 'session__movie', 'session__start_time')
+    list_filter = ('is_paid', MovieTitleFilter, SessionDayFilter, SessionIdFilter)
+    # Session.__str__ читает фильм
+    list_select_related = ('session__movie', 'user')
     search_fields = ('user__username', 'session__movie__title')
+    raw_id_fields = ('session', 'user')
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    actions = ['mark_paid']
+    
+    @admin.action(description='Отметить выбранные билеты оплаченными', permissions=['change'])
+    def mark_paid(self, request, queryset):
+        updated = bulk.mark_paid(queryset)
+        self.message_user(request, f'Оплаченными отмечено билетов: {updated}', messages.SUCCESS)
+    
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if 'delete_selected' in actions:
+            # Стандартное удаление пишет журнал и вызывает str() по каждому билету (по два
+            # запроса на строку) и удаляет по одному через сигналы; имя действия остается
+            # прежним, его отправляет страница подтверждения
+            actions['delete_selected'] = (TicketAdmin.delete_tickets, 'delete_selected', actions['delete_selected'][2])
+        return actions
+    
+    def delete_tickets(self, request, queryset):
+        if not request.POST.get('post'):
+            return delete_selected(self, request, queryset)
+        if not self.has_delete_permission(request):
+            raise PermissionDenied
+        deleted = bulk.delete_tickets(queryset)
+        self.message_user(request, f'Удалено билетов: {deleted}', messages.SUCCESS)
+    
+    def get_deleted_objects(self, objs, request):
+        # Страница подтверждения без перечня каждого билета; зависимых объектов у билета нет.
+        # Действие передает QuerySet, а страница удаления одного билета - список [obj]
+        count = objs.count() if isinstance(objs, QuerySet) else len(objs)
+        perms_needed = set() if self.has_delete_permission(request) else {self.opts.verbose_name}
+        return [f'{self.opts.verbose_name_plural}: {count}'], {self.opts.verbose_name_plural: count}, perms_needed, []
+
+class ArchivedTicketAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    # Архив только для просмотра: билеты переносит команда archive_tickets
+    list_display = ('session', 'user', 'row', 'seat', 'price', 'purchase_time', 'is_paid', 'archived_at')
+    list_filter = ('is_paid', MovieTitleFilter, SessionDayFilter, SessionIdFilter)
+    list_select_related = ('session__movie', 'user')
+    search_fields = ('user__username', 'session__movie__title')
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class SeatHoldAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('session', 'user', 'row', 'seat', 'expires_at')
+    list_select_related = ('session__movie', 'user')
+    raw_id_fields = ('session', 'user')
 
-class DiscountAdmin(admin.ModelAdmin):
+class DiscountAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('name', 'discount_percent', 'code', 'is_active', 'valid_from', 'valid_to')
     list_filter = ('is_active',)
     search_fields = ('name', 'code')
@@ -41,4 +205,6 @@ admin.site.register(Movie, MovieAdmin)
 admin.site.register(Hall, HallAdmin)
 admin.site.register(Session, SessionAdmin)
 admin.site.register(Ticket, TicketAdmin)
+admin.site.register(ArchivedTicket, ArchivedTicketAdmin)
+admin.site.register(SeatHold, SeatHoldAdmin)
 admin.site.register(Discount, DiscountAdmin)
\ No newline at end of file
@@ -0,0 +1,214 @@
+import numpy as np
+from django.db import NotSupportedError
+from django.db.models import BigIntegerField, Func
+from django.utils import timezone
+from .models import ArchivedTicket, Session, Ticket
+from .reports import local_day_range, parse_report_date
+
+# Билетов в одной пачке: память ограничена пачкой и массивами итогов, а не числом билетов
+CHUNK_SIZE = 100000
+# Кривая продаж по дням до начала сеанса; последняя корзина - "за MAX_LEAD_DAYS дней и раньше"
+MAX_LEAD_DAYS = 30
+WEEKDAYS = ('Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс')
+
+class EpochSeconds(Func):
+    # Время Unix в целых секундах считает сама БД: строки приходят числами,
+    # и пачка становится массивом NumPy без разбора datetime в Python.
+    # При USE_TZ столбцы хранят UTC, поэтому разность с 1970-01-01 и есть время Unix
+    output_field = BigIntegerField()
+    
+    def get_db_converters(self, connection):
+        # БД уже вернула целое: поэлементный int() в Python здесь только тратил бы время
+        return []
+    
+    def as_sql(self, compiler, connection, **extra):
+        raise NotSupportedError(f'EpochSeconds для {connection.vendor} не поддерживается')
+    
+    def as_sqlite(self, compiler, connection, **extra):
+        # %%%%s: после подстановки шаблона и замены %s на ? в запросе останется %s
+        return super().as_sql(compiler, connection, template="CAST(strftime('%%%%s', %(expressions)s) AS INTEGER)", **extra)
+    
+    def as_mysql(self, compiler, connection, **extra):
+        return super().as_sql(
+            compiler, connection, template="TIMESTAMPDIFF(SECOND, '1970-01-01 00:00:00', %(expressions)s)", **extra
+        )
+    
+    def as_postgresql(self, compiler, connection, **extra):
+        return super().as_sql(compiler, connection, template='EXTRACT(EPOCH FROM %(expressions)s)::bigint', **extra)
+
+SESSION_FIELDS = (
+    'pk', 'start_time', 'movie_id', 'movie__title', 'hall_id', 'hall__name', 'hall__seats_rows', 'hall__seats_per_row'
+)
+
+def percent(part, whole):
+    # Доля в процентах поэлементно, 0 там, где знаменатель нулевой
+    part = np.asarray(part, dtype=np.float64)
+    whole = np.asarray(whole, dtype=np.float64)
+    return np.round(np.divide(part * 100, whole, out=np.zeros_like(part), where=whole > 0), 1)
+
+class OccupancyAnalysis:
+    # Сеансы периода лежат в массивах по возрастанию id; билет находит свой сеанс
+    # через searchsorted, а итоги копятся через bincount по пачкам билетов
+    def __init__(self, sessions):
+        # sessions - строки SESSION_FIELDS с началом сеанса во времени Unix последним столбцом
+        columns = list(zip(*sessions)) or [()] * (len(SESSION_FIELDS) + 1)
+        ids, start_times, movie_ids, titles, hall_ids, hall_names, hall_rows, hall_per_row, start_ts = columns
+        count = len(ids)
+        
+        self.ids = np.array(ids, dtype=np.int64)
+        self.start_ts = np.array(start_ts, dtype=np.int64)
+        local_starts = [timezone.localtime(start_time) for start_time in start_times]
+        self.start_labels = [start_time.strftime('%d.%m.%Y %H:%M') for start_time in local_starts]
+        # Ячейка тепловой карты: день недели * 24 + час начала
+        self.cells = np.array([start_time.weekday() * 24 + start_time.hour for start_time in local_starts], dtype=np.int64)
+        
+        movies, self.movie_idx = np.unique(np.array(movie_ids, dtype=np.int64), return_inverse=True)
+        movie_titles = dict(zip(movie_ids, titles))
+        self.movie_titles = [movie_titles[movie_id] for movie_id in movies.tolist()]
+        
+        halls, self.hall_idx = np.unique(np.array(hall_ids, dtype=np.int64), return_inverse=True)
+        hall_info = dict(zip(hall_ids, zip(hall_names, hall_rows, hall_per_row)))
+        self.hall_names = [hall_info[hall_id][0] for hall_id in halls.tolist()]
+        self.hall_rows = np.array([hall_info[hall_id][1] for hall_id in halls.tolist()], dtype=np.int64)
+        self.hall_per_row = np.array([hall_info[hall_id][2] for hall_id in halls.tolist()], dtype=np.int64)
+        self.hall_seats = self.hall_rows * self.hall_per_row
+        # Места всех залов подряд в одном массиве: зал h начинается с hall_offset[h]
+        self.hall_offset = np.cumsum(self.hall_seats) - self.hall_seats
+        self.session_seats = self.hall_seats[self.hall_idx]
+        
+        self.sold = np.zeros(count, dtype=np.int64)
+        self.lead_days = np.zeros(len(movies) * (MAX_LEAD_DAYS + 1), dtype=np.int64)
+        self.seat_sales = np.zeros(int(self.hall_seats.sum()), dtype=np.int64)
+    
+    def add_tickets(self, session_ids, purchase_ts, rows, seats):
+        if not len(self.ids) or not len(session_ids):
+            return
+        idx = np.searchsorted(self.ids, session_ids)
+        # Сеанс, созданный уже после выборки сеансов, в отчет не попадает
+        known = (idx < len(self.ids)) & (self.ids[np.minimum(idx, len(self.ids) - 1)] == session_ids)
+        idx, purchase_ts, rows, seats = idx[known], purchase_ts[known], rows[known], seats[known]
+        
+        self.sold += np.bincount(idx, minlength=len(self.sold))
+        
+        days = np.clip(np.floor((self.start_ts[idx] - purchase_ts) / 86400), 0, MAX_LEAD_DAYS).astype(np.int64)
+        self.lead_days += np.bincount(
+            self.movie_idx[idx] * (MAX_LEAD_DAYS + 1) + days, minlength=len(self.lead_days)
+        )
+        
+        hall = self.hall_idx[idx]
+        per_row = self.hall_per_row[hall]
+        # Места вне текущих размеров зала (зал уменьшили после продажи) не учитываются
+        inside = (rows >= 1) & (rows <= self.hall_rows[hall]) & (seats >= 1) & (seats <= per_row)
+        positions = self.hall_offset[hall] + (rows - 1) * per_row + seats - 1
+        self.seat_sales += np.bincount(positions[inside], minlength=len(self.seat_sales))
+    
+    def fill_rate_rows(self):
+        fill = percent(self.sold, self.session_seats)
+        for i in np.argsort(self.start_ts, kind='stable').tolist():
+            yield (
+                self.start_labels[i],
+                self.movie_titles[self.movie_idx[i]],
+                self.hall_names[self.hall_idx[i]],
+                int(self.sold[i]),
+                int(self.session_seats[i]),
+                float(fill[i]),
+            )
+    
+    def demand_rows(self):
+        cells = 7 * 24
+        sessions = np.bincount(self.cells, minlength=cells)
+        tickets = np.bincount(self.cells, weights=self.sold, minlength=cells)
+        seats = np.bincount(self.cells, weights=self.session_seats, minlength=cells)
+        fill = percent(tickets, seats)
+        for cell in np.flatnonzero(sessions).tolist():
+            yield (
+                WEEKDAYS[cell // 24],
+                f'{cell % 24:02d}:00',
+                int(sessions[cell]),
+                int(tickets[cell]),
+                float(fill[cell]),
+            )
+    
+    def sell_through_rows(self):
+        curves = self.lead_days.reshape(len(self.movie_titles), MAX_LEAD_DAYS + 1)
+        # Продано к моменту "за d дней до начала" - все покупки с упреждением не меньше d
+        sold_by = np.cumsum(curves[:, ::-1], axis=1)[:, ::-1]
+        share = percent(sold_by, curves.sum(axis=1, keepdims=True))
+        for movie in np.flatnonzero(curves.sum(axis=1)).tolist():
+            for days in range(MAX_LEAD_DAYS, -1, -1):
+                yield (
+                    self.movie_titles[movie],
+                    f'{days}+' if days == MAX_LEAD_DAYS else str(days),
+                    int(curves[movie, days]),
+                    float(share[movie, days]),
+                )
+    
+    def seat_popularity_rows(self):
+        # Доля сеансов зала за период, на которые место было продано
+        sessions = np.bincount(self.hall_idx, minlength=len(self.hall_names))
+        for hall, name in enumerate(self.hall_names):
+            start = self.hall_offset[hall]
+            sales = self.seat_sales[start:start + self.hall_seats[hall]]
+            share = percent(sales, np.full(len(sales), sessions[hall]))
+            per_row = int(self.hall_per_row[hall])
+            for position, (count, seat_share) in enumerate(zip(sales.tolist(), share.tolist())):
+                yield (name, position // per_row + 1, position % per_row + 1, count, seat_share)
+
+# Тип отчета -> (название, заголовок CSV, метод OccupancyAnalysis)
+REPORT_TYPES = {
+    'fill_rate': (
+        'Заполняемость сеансов',
+        ['Начало сеанса', 'Фильм', 'Зал', 'Продано мест', 'Мест в зале', 'Заполняемость, %'],
+        OccupancyAnalysis.fill_rate_rows,
+    ),
+    'demand': (
+        'Спрос по дням недели и часам',
+        ['День недели', 'Час начала', 'Сеансов', 'Продано мест', 'Заполняемость, %'],
+        OccupancyAnalysis.demand_rows,
+    ),
+    'sell_through': (
+        'Кривые продаж фильмов',
+        ['Фильм', 'Дней до начала', 'Продано в этот день', 'Продано к этому дню, %'],
+        OccupancyAnalysis.sell_through_rows,
+    ),
+    'seat_popularity': (
+        'Популярность мест',
+        ['Зал', 'Ряд', 'Место', 'Продаж', 'Доля сеансов, %'],
+        OccupancyAnalysis.seat_popularity_rows,
+    ),
+}
+
+def ticket_chunks(range_start, range_end, chunk_size=CHUNK_SIZE):
+    # Билеты сеансов периода, включая архив, пачками по ключу pk в виде массивов NumPy
+    for model in (Ticket, ArchivedTicket):
+        tickets = model.objects.filter(
+            session__start_time__gte=range_start, session__start_time__lt=range_end
+        ).order_by('pk').values_list('pk', 'session_id', EpochSeconds('purchase_time'), 'row', 'seat')
+        
+        last = 0
+        while True:
+            # Все столбцы целые: пачка сразу становится матрицей, столбцы - ее срезы
+            batch = np.array(list(tickets.filter(pk__gt=last)[:chunk_size]), dtype=np.int64)
+            if not len(batch):
+                break
+            yield batch[:, 1], batch[:, 2], batch[:, 3], batch[:, 4]
+            if len(batch) < chunk_size:
+                break
+            last = int(batch[-1, 0])
+
+def analyze(start_date, end_date, chunk_size=CHUNK_SIZE):
+    # Сеансы, начавшиеся в [start_date, end_date] по местному времени, и все их билеты
+    range_start, range_end = local_day_range(parse_report_date(start_date), parse_report_date(end_date))
+    sessions = Session.objects.filter(
+        start_time__gte=range_start, start_time__lt=range_end
+    ).order_by('pk').values_list(*SESSION_FIELDS, EpochSeconds('start_time'))
+    
+    analysis = OccupancyAnalysis(list(sessions))
+    for chunk in ticket_chunks(range_start, range_end, chunk_size):
+        analysis.add_tickets(*chunk)
+    return analysis
+
+def generate_report(start_date, end_date, report_type):
+    # (заголовок, строки) для отчета из REPORT_TYPES
+    _, header, rows = REPORT_TYPES[report_type]
+    return header, list(rows(analyze(start_date, end_date)))
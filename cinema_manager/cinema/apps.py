@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class CinemaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'cinema'
\ No newline at end of file
+    name = 'cinema'
+    
+    def ready(self):
+        from . import checks, signals  # noqa: F401
\ No newline at end of file
@@ -0,0 +1,37 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .bulk import delete_rows
+from .models import ArchivedTicket, Ticket
+
+ARCHIVE_FIELDS = ('id', 'session_id', 'user_id', 'row', 'seat', 'price', 'purchase_time', 'is_paid')
+
+def archive_cutoff(days=None, now=None):
+    if days is None:
+        days = getattr(settings, 'CINEMA_ARCHIVE_AFTER_DAYS', 90)
+    return (now or timezone.now()) - timedelta(days=days)
+
+def archivable_tickets(cutoff):
+    # Билеты сеансов, закончившихся до cutoff; такие сеансы уже не меняются
+    return Ticket.objects.filter(session__end_time__lt=cutoff)
+
+def archive_batch(cutoff, batch_size=1000, after=0):
+    # Переносит до batch_size билетов с id > after одной транзакцией: копия в архив
+    # и удаление из Ticket видны вместе, поэтому прерванный запуск оставляет данные
+    # целыми, а следующий продолжает с оставшихся. Возвращает (перенесено, последний id)
+    ids = list(
+        archivable_tickets(cutoff).filter(pk__gt=after).order_by('pk').values_list('pk', flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0, None
+    
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(Ticket.objects.select_for_update().filter(pk__in=ids).values(*ARCHIVE_FIELDS))
+        ArchivedTicket.objects.bulk_create([ArchivedTicket(archived_at=now, **row) for row in rows])
+        # Сырой DELETE без сигналов: билет не отменен, а перенесен, поэтому сигналы
+        # удаления ошиблись бы - вычли бы продажу из DailySales и объявили бы место
+        # освободившимся. Сеанс закончился, его схема зала больше не меняется
+        delete_rows(Ticket, [row['id'] for row in rows])
+    return len(rows), ids[-1]
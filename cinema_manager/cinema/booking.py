@@ -0,0 +1,78 @@
+import operator
+from collections import namedtuple
+from functools import reduce
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import SeatHold, Ticket
+from .utils import calculate_final_price
+from . import occupancy, rollups
+
+MAX_SEATS_PER_BOOKING = 20
+
+# created - созданные билеты (или удержания), conflicts - занятые места, invalid - места вне зала
+BookingResult = namedtuple('BookingResult', ['created', 'conflicts', 'invalid'])
+
+def parse_seats(raw_seats):
+    # [[ряд, место], ...] -> список уникальных пар (ряд, место) в исходном порядке
+    # Только целые числа JSON: int() молча превратил бы 1.5 в 1, а "1" - в 1; bool - тоже int
+    seats = []
+    for item in raw_seats:
+        row, seat = item
+        if any(type(value) is not int for value in (row, seat)):
+            raise TypeError('Ряд и место должны быть целыми числами')
+        seats.append((row, seat))
+    return list(dict.fromkeys(seats))
+
+def seats_filter(seats):
+    return reduce(operator.or_, (Q(row=row, seat=seat) for row, seat in seats))
+
+def taken_seats(session, seats):
+    return sorted(Ticket.objects.filter(session=session).filter(seats_filter(seats)).values_list('row', 'seat'))
+
+def book_seats(session, user, seats, discount=None):
+    # Все места одним INSERT в одной транзакции: либо бронируются все, либо ни одно.
+    # Занятость заранее не проверяем - это делает уникальный индекс (session, row, seat),
+    # так что два покупателя не могут продать одно место даже при гонке
+    hall = session.hall
+    invalid = [
+        (row, seat) for row, seat in seats
+        if not (1 <= row <= hall.seats_rows and 1 <= seat <= hall.seats_per_row)
+    ]
+    if invalid or not seats:
+        return BookingResult([], [], invalid)
+
+    price = calculate_final_price(session.base_price, user, discount)
+    tickets = [
+        Ticket(session=session, user=user, row=row, seat=seat, price=price)
+        for row, seat in seats
+    ]
+
+    try:
+        with transaction.atomic():
+            Ticket.objects.bulk_create(tickets)
+            
+            # Места, которые сейчас удерживает другой покупатель, продавать нельзя;
+            # остальные удержания проданных мест больше не нужны
+            holds = SeatHold.objects.filter(session=session).filter(seats_filter(seats))
+            held = sorted(
+                holds.filter(expires_at__gt=timezone.now()).exclude(user=user).values_list('row', 'seat')
+            )
+            if held:
+                transaction.set_rollback(True)
+            else:
+                # Остались свои и истекшие чужие удержания: удаляем все, иначе purge_expired
+                # или release_holds потом объявят проданное место освободившимся
+                holds.delete()
+                # bulk_create не отправляет сигналы, поэтому итоги и схему зала обновляем сами
+                rollups.apply_tickets(tickets)
+                occupancy.record_changes(session.pk, booked=seats)
+    except IntegrityError:
+        conflicts = taken_seats(session, seats)
+        if not conflicts:
+            raise
+        return BookingResult([], conflicts, [])
+
+    if held:
+        return BookingResult([], held, [])
+    return BookingResult(tickets, [], [])
@@ -0,0 +1,216 @@
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from .booking import BookingResult, book_seats as book_directly, seats_filter
+from .models import SeatHold, Ticket
+from .utils import calculate_final_prices
+from . import occupancy, rollups
+
+logger = logging.getLogger(__name__)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+class BookingRequest:
+    # Заявка ждет в очереди, пока поток записи не ответит через event
+    def __init__(self, session, user, seats, discount):
+        self.session = session
+        self.user = user
+        self.seats = seats
+        self.discount = discount
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.taken = False
+        self.cancelled = False
+        self.result = None
+        self.error = None
+    
+    def take(self):
+        # Поток записи забирает заявку, если ожидающий еще не отказался от очереди
+        with self.lock:
+            if self.cancelled:
+                return False
+            self.taken = True
+            return True
+    
+    def cancel(self):
+        with self.lock:
+            if self.taken:
+                return False
+            self.cancelled = True
+            return True
+    
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.event.set()
+
+class BookingQueue:
+    # Групповая запись покупок: запросы кладут заявки в очередь, один поток
+    # забирает их пачками, разрешает споры за места в памяти по схеме зала
+    # и вставляет билеты всей пачки одним bulk_create в одной транзакции
+    def __init__(self, max_batch=50, max_wait=0.005, max_size=1000, timeout=2.0):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.requests = queue.Queue(max_size)
+        self.thread = threading.Thread(target=self.run, name='booking-writer', daemon=True)
+        self.thread.start()
+    
+    def submit(self, session, user, seats, discount=None):
+        request = BookingRequest(session, user, seats, discount)
+        try:
+            self.requests.put_nowait(request)
+        except queue.Full:
+            # Очередь переполнена - покупка идет прежним путем в потоке запроса
+            return book_directly(session, user, seats, discount)
+        
+        if not request.event.wait(self.timeout) and request.cancel():
+            return book_directly(session, user, seats, discount)
+        # Заявка уже в пачке: ответ придет, как только пачка будет записана
+        request.event.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+    
+    def collect(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return [request for request in batch if request.take()]
+    
+    def run(self):
+        while True:
+            batch = self.collect()
+            if not batch:
+                continue
+            close_old_connections()
+            try:
+                results = self.process(batch)
+            except Exception as exc:
+                logger.exception('Не удалось записать пачку из %s покупок', len(batch))
+                for request in batch:
+                    request.finish(error=exc)
+            else:
+                for request, result in zip(batch, results):
+                    request.finish(result)
+    
+    def process(self, batch):
+        try:
+            with transaction.atomic():
+                results, tickets = resolve(batch)
+                write(batch, results, tickets)
+            return results
+        except IntegrityError:
+            # Схема в кэше отстала от БД (место продали в обход очереди):
+            # каждая заявка пачки повторяется прежним путем, ее рассудит уникальный индекс
+            return [
+                book_directly(request.session, request.user, request.seats, request.discount)
+                for request in batch
+            ]
+
+def resolve(batch):
+    # Заявки рассматриваются в порядке поступления: первая занимает места,
+    # следующим на те же места достается конфликт
+    session_ids = {request.session.pk for request in batch}
+    holds = {}
+    for session_id, user_id, row, seat in SeatHold.objects.filter(
+        session_id__in=session_ids, expires_at__gt=timezone.now()
+    ).values_list('session_id', 'user_id', 'row', 'seat'):
+        holds[(session_id, row, seat)] = user_id
+    
+    seat_maps = {}
+    results = []
+    for request in batch:
+        session = request.session
+        seat_map = seat_maps.get(session.pk)
+        if seat_map is None:
+            seat_map = seat_maps[session.pk] = occupancy.get_seat_map(session)
+        
+        invalid = [(row, seat) for row, seat in request.seats if not seat_map.contains(row, seat)]
+        if invalid or not request.seats:
+            results.append(BookingResult([], [], invalid))
+            continue
+        
+        conflicts = []
+        for row, seat in request.seats:
+            hold = holds.get((session.pk, row, seat))
+            if hold is not None:
+                # Свое удержание место не занимает, чужое - занимает
+                if hold != request.user.pk:
+                    conflicts.append((row, seat))
+            elif seat_map.is_booked(row, seat):
+                conflicts.append((row, seat))
+        if conflicts:
+            results.append(BookingResult([], sorted(conflicts), []))
+            continue
+        
+        for row, seat in request.seats:
+            seat_map.mark(row, seat)
+            # Удержание исполнено покупкой: следующие заявки пачки сверяются со схемой
+            holds.pop((session.pk, row, seat), None)
+        results.append(None)
+    
+    prices = iter(calculate_final_prices(
+        (request.session.base_price, request.user, request.discount)
+        for request, result in zip(batch, results) if result is None
+    ))
+    tickets = []
+    for i, request in enumerate(batch):
+        if results[i] is not None:
+            continue
+        price = next(prices)
+        created = [
+            Ticket(session=request.session, user=request.user, row=row, seat=seat, price=price)
+            for row, seat in request.seats
+        ]
+        results[i] = BookingResult(created, [], [])
+        tickets.extend(created)
+    return results, tickets
+
+def write(batch, results, tickets):
+    if not tickets:
+        return
+    Ticket.objects.bulk_create(tickets)
+    
+    # bulk_create не отправляет сигналы, поэтому итоги и схему зала обновляем сами
+    rollups.apply_tickets(tickets)
+    booked = {}
+    for request, result in zip(batch, results):
+        if result.created:
+            booked.setdefault(request.session.pk, []).extend(request.seats)
+    for session_id, seats in booked.items():
+        # Удержания проданных мест (свои и истекшие чужие) удаляются все, иначе
+        # purge_expired или release_holds потом объявят проданное место освободившимся
+        SeatHold.objects.filter(session_id=session_id).filter(seats_filter(seats)).delete()
+        occupancy.record_changes(session_id, booked=seats)
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = BookingQueue(
+                max_batch=getattr(settings, 'CINEMA_BOOKING_QUEUE_BATCH', 50),
+                max_wait=getattr(settings, 'CINEMA_BOOKING_QUEUE_WAIT_MS', 5) / 1000,
+                max_size=getattr(settings, 'CINEMA_BOOKING_QUEUE_SIZE', 1000),
+                timeout=getattr(settings, 'CINEMA_BOOKING_QUEUE_TIMEOUT', 2.0),
+            )
+        return _queue
+
+def book_seats(session, user, seats, discount=None):
+    # Тот же контракт, что у booking.book_seats; при CINEMA_BOOKING_QUEUE покупки
+    # записываются пачками потоком записи, иначе - в потоке запроса
+    if not getattr(settings, 'CINEMA_BOOKING_QUEUE', False):
+        return book_directly(session, user, seats, discount)
+    return get_queue().submit(session, user, seats, discount)
@@ -0,0 +1,63 @@
+from django.db import connections, router, transaction
+from .models import Ticket
+from . import occupancy, rollups
+
+CHUNK_SIZE = 1000
+
+def chunked_ids(tickets, chunk_size):
+    # Keyset по pk: в админке можно выбрать все билеты по фильтру, а это миллионы строк
+    last = 0
+    while True:
+        ids = list(tickets.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+def delete_rows(model, pks):
+    # Один DELETE ... WHERE pk IN (...) в обход delete(): без загрузки строк, сигналов
+    # и каскада Django. Только для таблиц, на которые никто не ссылается; все, что
+    # делают сигналы удаления, вызывающий решает сам
+    if not pks:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk_column = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {pk_column} IN ({placeholders})', list(pks))
+        return cursor.rowcount
+
+def mark_paid(tickets, chunk_size=CHUNK_SIZE):
+    # Один UPDATE на пачку вместо save() каждого билета; сводка DailySales
+    # пополняется одним GROUP BY по оплаченной пачке
+    updated = 0
+    for ids in chunked_ids(tickets.filter(is_paid=False), chunk_size):
+        with transaction.atomic():
+            # Блокировка строк: параллельная оплата тех же билетов не попадет в сводку дважды
+            ids = list(
+                Ticket.objects.select_for_update().filter(pk__in=ids, is_paid=False).values_list('pk', flat=True)
+            )
+            Ticket.objects.filter(pk__in=ids).update(is_paid=True)
+            rollups.apply_rows(Ticket.objects.filter(pk__in=ids))
+        updated += len(ids)
+    return updated
+
+def delete_tickets(tickets, chunk_size=CHUNK_SIZE):
+    # Сырой DELETE на пачку: обычный delete() при подключенных сигналах загружает
+    # и удаляет билеты по одному. На билеты никто не ссылается, каскада нет.
+    # Сигналы здесь не нужны: сводка и схема зала обновляются ниже явно,
+    # одним GROUP BY и одним событием на сеанс, в той же транзакции
+    deleted = 0
+    for ids in chunked_ids(tickets, chunk_size):
+        with transaction.atomic():
+            released = {}
+            seats = Ticket.objects.select_for_update().filter(pk__in=ids).values_list('session_id', 'row', 'seat')
+            for session_id, row, seat in seats:
+                released.setdefault(session_id, []).append((row, seat))
+            
+            rollups.apply_rows(Ticket.objects.filter(pk__in=ids), sign=-1)
+            deleted += delete_rows(Ticket, ids)
+            for session_id, session_seats in released.items():
+                occupancy.record_changes(session_id, released=session_seats)
+    return deleted
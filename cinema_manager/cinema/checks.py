@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Бэкенды, у которых каждый процесс видит свой кэш
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    # Поколение афиши (cinema.schedule), версии схем залов (cinema.occupancy)
+    # и страницы (cinema.pagecache) сбрасываются только в кэше процесса, который
+    # сделал изменение; остальные воркеры с локальным кэшем отдают устаревшие данные
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Warning(
+            f'Кэш по умолчанию ({backend}) свой у каждого процесса: при нескольких воркерах '
+            'афиша, схемы залов и страницы в остальных процессах не обновятся после изменений',
+            hint='Укажите в CACHES общий бэкенд с атомарным incr (Redis или Memcached)',
+            id='cinema.W001',
+        )
+    ]
@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Discount
+
+# Неизвестные и неактивные коды тоже кэшируются, иначе перебор кодов шел бы в БД
+MISSING = object()
+
+class DiscountCache:
+    # LRU-кэш кодов скидок в памяти процесса; записи живут не дольше ttl секунд,
+    # так что изменения из других процессов видны не позже чем через ttl
+    def __init__(self, max_size=256, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, code):
+        with self.lock:
+            entry = self.entries.get(code)
+            if entry is None:
+                return None
+            stored_at, discount = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self.entries[code]
+                return None
+            self.entries.move_to_end(code)
+            return discount
+
+    def put(self, code, discount):
+        with self.lock:
+            self.entries[code] = (time.monotonic(), discount)
+            self.entries.move_to_end(code)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+discount_cache = DiscountCache(
+    getattr(settings, 'CINEMA_DISCOUNT_CACHE_SIZE', 256),
+    getattr(settings, 'CINEMA_DISCOUNT_CACHE_SECONDS', 60),
+)
+
+def active_discounts():
+    return Discount.objects.filter(is_active=True)
+
+def valid_at(discount, now=None):
+    # Активность проверена запросом, здесь - только период действия
+    if discount is MISSING:
+        return None
+    now = now or timezone.now()
+    return discount if discount.valid_from <= now <= discount.valid_to else None
+
+def get_discount(code, now=None):
+    # Действующая скидка по коду или None
+    if not code:
+        return None
+    discount = discount_cache.get(code)
+    if discount is None:
+        discount = active_discounts().filter(code=code).first() or MISSING
+        discount_cache.put(code, discount)
+    return valid_at(discount, now)
+
+async def aget_discount(code, now=None):
+    if not code:
+        return None
+    discount = discount_cache.get(code)
+    if discount is None:
+        discount = await active_discounts().filter(code=code).afirst() or MISSING
+        discount_cache.put(code, discount)
+    return valid_at(discount, now)
+
+def invalidate():
+    # Скидки меняются редко, поэтому сбрасывается весь кэш: так не нужно помнить
+    # прежний код переименованной скидки. После коммита, иначе параллельный запрос
+    # успеет закэшировать старую строку
+    transaction.on_commit(discount_cache.clear)
\ No newline at end of file
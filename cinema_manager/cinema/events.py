@@ -0,0 +1,104 @@
+import asyncio
+import json
+import threading
+from functools import lru_cache
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+HEARTBEAT_SECONDS = 15
+QUEUE_SIZE = 100
+
+class LocalBroker:
+    # Pub/sub внутри процесса: публикация идет из потоков обработки запросов
+    # (сигналы билетов), подписчики - корутины SSE в event loop воркера
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def subscribe(self, session_id):
+        queue = asyncio.Queue(QUEUE_SIZE)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self.lock:
+            self.subscribers.setdefault(session_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, session_id, subscriber):
+        with self.lock:
+            subscribers = self.subscribers.get(session_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.subscribers[session_id]
+
+    def publish(self, session_id, event):
+        with self.lock:
+            subscribers = list(self.subscribers.get(session_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self.deliver, queue, event)
+            except RuntimeError:
+                # event loop подписчика уже закрыт
+                pass
+
+    @staticmethod
+    def deliver(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Медленный клиент пропустит событие и заметит разрыв в версиях
+            pass
+
+    def connection_count(self):
+        with self.lock:
+            return sum(len(subscribers) for subscribers in self.subscribers.values())
+
+@lru_cache(maxsize=None)
+def get_broker():
+    path = getattr(settings, 'CINEMA_EVENT_BROKER', 'cinema.events.LocalBroker')
+    return import_string(path)()
+
+def publish_seats(session_id, version, booked=None, released=None):
+    event = {'version': version}
+    if booked is None and released is None:
+        # Состав изменений неизвестен, клиенту нужно перечитать схему целиком
+        event['reset'] = True
+    else:
+        event['booked'] = [list(seat) for seat in booked or ()]
+        event['released'] = [list(seat) for seat in released or ()]
+    get_broker().publish(session_id, event)
+
+def format_event(event):
+    return f"id: {event['version']}\nevent: seats\ndata: {json.dumps(event)}\n\n"
+
+async def seat_event_stream(session_id, last_version=None):
+    from . import occupancy
+
+    broker = get_broker()
+    subscriber = broker.subscribe(session_id)
+    queue = subscriber[1]
+    try:
+        version = await sync_to_async(occupancy.get_version)(session_id)
+        changes = None
+        if last_version is not None:
+            changes = await sync_to_async(occupancy.changes_since)(session_id, last_version, version)
+
+        yield 'retry: 3000\n\n'
+        if changes is not None:
+            booked, released = changes
+            yield format_event({'version': version, 'booked': booked, 'released': released})
+        else:
+            yield format_event({'version': version, 'reset': True})
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if event['version'] > version:
+                version = event['version']
+                yield format_event(event)
+    finally:
+        broker.unsubscribe(session_id, subscriber)
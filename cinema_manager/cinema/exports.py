@@ -0,0 +1,31 @@
+import csv
+import io
+from django.http import StreamingHttpResponse
+
+REPORT_HEADER = ['Период', 'Количество билетов', 'Общая выручка']
+
+TICKETS_HEADER = [
+    'Билет', 'Время покупки', 'Фильм', 'Зал', 'Начало сеанса',
+    'Ряд', 'Место', 'Цена', 'Покупатель',
+]
+
+def csv_chunks(header, rows, chunk_bytes=64 * 1024):
+    # Строки копятся в небольшом буфере и отдаются кусками, весь файл в памяти не держим
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def streaming_csv_response(filename, header, rows):
+    response = StreamingHttpResponse(csv_chunks(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,6 +1,9 @@
+from datetime import timedelta
 from django import forms
+from django.utils import timezone
 from django.contrib.auth.forms import UserCreationForm
 from .models import User, Ticket, Session
+from .analytics import REPORT_TYPES as ANALYTICS_REPORT_TYPES
 
 class UserRegistrationForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -29,9 +32,6 @@ class TicketBookingForm(forms.ModelForm):
             if row > self.session.hall.seats_rows or seat > self.session.hall.seats_per_row:
                 raise forms.ValidationError("Указано несуществующее место")
             
-            if Ticket.objects.filter(session=self.session, row=row, seat=seat).exists():
-                raise forms.ValidationError("Это место уже занято")
-        
         return cleaned_data
 
 class DiscountApplyForm(forms.Form):
@@ -43,4 +43,42 @@ class SessionForm(forms.ModelForm):
         fields = ['movie', 'hall', 'start_time', 'base_price']
         widgets = {
             'start_time': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
-        }
\ No newline at end of file
+        }
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        movie = cleaned_data.get('movie')
+        hall = cleaned_data.get('hall')
+        start_time = cleaned_data.get('start_time')
+        
+        if movie and hall and start_time:
+            end_time = start_time + timedelta(minutes=movie.duration)
+            overlapping = Session.objects.filter(
+                hall=hall, start_time__lt=end_time, end_time__gt=start_time
+            ).exclude(pk=self.instance.pk).order_by('start_time').first()
+            if overlapping:
+                raise forms.ValidationError(
+                    f"В зале уже идет сеанс {timezone.localtime(overlapping.start_time):%d.%m.%Y %H:%M}"
+                    f"–{timezone.localtime(overlapping.end_time):%H:%M}"
+                )
+        
+        return cleaned_data
+
+class ScheduleImportForm(forms.Form):
+    file = forms.FileField(label='CSV-файл', help_text='Столбцы: movie, hall, start_time, base_price')
+    dry_run = forms.BooleanField(required=False, label='Только проверить')
+
+class AnalyticsReportForm(forms.Form):
+    start_date = forms.DateField(label='С', widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(label='По', widget=forms.DateInput(attrs={'type': 'date'}))
+    report_type = forms.ChoiceField(
+        label='Отчет', choices=[(key, title) for key, (title, _, _) in ANALYTICS_REPORT_TYPES.items()]
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise forms.ValidationError('Начало периода позже конца')
+        return cleaned_data
\ No newline at end of file
@@ -0,0 +1,104 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .booking import BookingResult, seats_filter, taken_seats
+from .models import SeatHold
+from . import occupancy
+
+def hold_ttl():
+    return timedelta(seconds=getattr(settings, 'CINEMA_SEAT_HOLD_SECONDS', 600))
+
+def active_holds(now=None):
+    return SeatHold.objects.filter(expires_at__gt=now or timezone.now())
+
+def held_seats(session, seats):
+    return sorted(active_holds().filter(session=session).filter(seats_filter(seats)).values_list('row', 'seat'))
+
+def unsold_seats(session, seats):
+    # Удержание могли создать одновременно с покупкой места: проданное место
+    # при удалении такого удержания не объявляется освободившимся
+    sold = set(taken_seats(session, seats))
+    return [seat for seat in seats if seat not in sold]
+
+def create_holds(session, user, seats, ttl=None):
+    # Удерживает места на время ввода скидки/оплаты; как и бронирование - все или ничего
+    hall = session.hall
+    invalid = [
+        (row, seat) for row, seat in seats
+        if not (1 <= row <= hall.seats_rows and 1 <= seat <= hall.seats_per_row)
+    ]
+    if invalid or not seats:
+        return BookingResult([], [], invalid)
+
+    conflicts = taken_seats(session, seats)
+    if conflicts:
+        return BookingResult([], conflicts, [])
+
+    now = timezone.now()
+    expires_at = now + (ttl or hold_ttl())
+    holds = [
+        SeatHold(session=session, user=user, row=row, seat=seat, expires_at=expires_at)
+        for row, seat in seats
+    ]
+
+    try:
+        with transaction.atomic():
+            # Истекшие удержания этих мест больше ничего не блокируют, а свои продлеваем
+            SeatHold.objects.filter(session=session).filter(seats_filter(seats)).filter(
+                Q(expires_at__lte=now) | Q(user=user)
+            ).delete()
+            SeatHold.objects.bulk_create(holds)
+            occupancy.record_changes(session.pk, booked=seats)
+    except IntegrityError:
+        conflicts = held_seats(session, seats)
+        if not conflicts:
+            raise
+        return BookingResult([], conflicts, [])
+
+    return BookingResult(holds, [], [])
+
+def release_holds(session, user, seats=None):
+    holds = SeatHold.objects.filter(session=session, user=user)
+    if seats:
+        holds = holds.filter(seats_filter(seats))
+
+    with transaction.atomic():
+        released = list(holds.values_list('row', 'seat'))
+        if released:
+            holds.delete()
+            released = unsold_seats(session, released)
+            if released:
+                occupancy.record_changes(session.pk, released=released)
+    return released
+
+def purge_expired(batch_size=500, max_batches=None):
+    # Удаляет истекшие удержания пачками, каждая пачка - отдельная короткая транзакция
+    purged = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            expired = list(
+                SeatHold.objects.filter(expires_at__lte=timezone.now())
+                .order_by('expires_at')
+                .values_list('pk', 'session_id', 'row', 'seat')[:batch_size]
+            )
+            if not expired:
+                break
+
+            SeatHold.objects.filter(pk__in=[pk for pk, _, _, _ in expired]).delete()
+
+            released = {}
+            for _, session_id, row, seat in expired:
+                released.setdefault(session_id, []).append((row, seat))
+            for session_id, seats in released.items():
+                seats = unsold_seats(session_id, seats)
+                if seats:
+                    occupancy.record_changes(session_id, released=seats)
+
+        purged += len(expired)
+        batches += 1
+        if len(expired) < batch_size:
+            break
+    return purged
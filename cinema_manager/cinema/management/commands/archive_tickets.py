@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from cinema.archive import archive_batch, archive_cutoff
+
+class Command(BaseCommand):
+    help = 'Переносит билеты давно прошедших сеансов в архив (ArchivedTicket) небольшими транзакциями'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Сеансы, закончившиеся раньше стольких дней назад; по умолчанию CINEMA_ARCHIVE_AFTER_DAYS'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--max-batches', type=int, help='Остановиться после стольких пачек; следующий запуск продолжит')
+        parser.add_argument('--pause', type=float, default=0.0, help='Пауза между пачками, сек, чтобы не мешать продажам')
+    
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        started = time.perf_counter()
+        moved, batches, last_id = 0, 0, 0
+        
+        while options['max_batches'] is None or batches < options['max_batches']:
+            count, last_id = archive_batch(cutoff, options['batch_size'], after=last_id)
+            if last_id is None:
+                break
+            moved += count
+            batches += 1
+            self.stdout.write(f'Пачка {batches}: перенесено {count}, до id {last_id}')
+            if options['pause']:
+                time.sleep(options['pause'])
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив билетов: {moved} за {time.perf_counter() - started:.1f} с'
+        ))
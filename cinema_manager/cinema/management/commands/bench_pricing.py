@@ -0,0 +1,51 @@
+import json
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from cinema.models import Discount, User
+from cinema.utils import calculate_final_price, calculate_final_prices
+
+class Command(BaseCommand):
+    help = 'Сравнивает calculate_final_price и calculate_final_prices на синтетических данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help='Сколько цен посчитать')
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        today = date.today()
+        # Модели не сохраняются: цене нужны только birth_date и discount_percent
+        users = [
+            User(pk=i, birth_date=today - timedelta(days=rng.randint(10 * 365, 90 * 365)) if rng.random() < 0.8 else None)
+            for i in range(1, options['users'] + 1)
+        ] + [None]
+        discounts = [Discount(discount_percent=percent) for percent in (5, 10, 15, 20, 33, 50)] + [None] * 6
+        base_prices = [Decimal(price) for price in ('250.00', '300.00', '350.50', '420.00', '499.99', '600.00')]
+
+        items = [
+            (rng.choice(base_prices), rng.choice(users), rng.choice(discounts))
+            for _ in range(options['count'])
+        ]
+
+        started = time.perf_counter()
+        expected = [calculate_final_price(base_price, user, discount) for base_price, user, discount in items]
+        scalar_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        prices = calculate_final_prices(items)
+        batch_seconds = time.perf_counter() - started
+
+        mismatches = sum(1 for a, b in zip(expected, prices) if a != b or str(a) != str(b))
+        self.stdout.write(json.dumps({
+            'prices': len(items),
+            'scalar_seconds': round(scalar_seconds, 3),
+            'batch_seconds': round(batch_seconds, 3),
+            'speedup': round(scalar_seconds / batch_seconds, 1),
+            'mismatches': mismatches,
+        }, indent=2))
+        if mismatches:
+            raise CommandError('Пакетный расчет разошелся с calculate_final_price')
\ No newline at end of file
@@ -0,0 +1,99 @@
+import json
+import random
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
+from cinema.models import Hall, Session
+from cinema.occupancy import SeatMap
+from cinema import occupancy, seatmap
+
+# (рядов, мест в ряду): от 50 до 2000 мест
+HALL_SIZES = [(5, 10), (10, 20), (20, 25), (25, 40), (40, 50)]
+
+# Прежняя схема зала во вложенных циклах шаблона - база для сравнения
+TEMPLATE_SEAT_MAP = Template('''
+{% for row, seats in seat_rows %}
+<div class="seat-row d-flex justify-content-center mb-2">
+    <div class="row-label me-2">Ряд {{ row }}</div>
+    <div class="seats d-flex">
+        {% for seat, booked in seats %}
+            {% if booked %}
+                <div class="seat booked mx-1" title="Ряд {{ row }}, Место {{ seat }}" data-row="{{ row }}" data-seat="{{ seat }}" onclick="selectSeat(this)">{{ seat }}</div>
+            {% else %}
+                <div class="seat available mx-1" title="Ряд {{ row }}, Место {{ seat }}" data-row="{{ row }}" data-seat="{{ seat }}" onclick="selectSeat(this)">{{ seat }}</div>
+            {% endif %}
+        {% endfor %}
+    </div>
+</div>
+{% endfor %}
+''')
+
+def seat_rows(seat_map):
+    rows = {}
+    for row, seat, booked in seat_map.iter_seats():
+        rows.setdefault(row, []).append((seat, booked))
+    return list(rows.items())
+
+def timed(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return round((time.perf_counter() - started) / repeat * 1000, 3)
+
+class Command(BaseCommand):
+    help = 'Сравнивает отрисовку схемы зала шаблоном, cinema.seatmap.render и кэшированный фрагмент'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50, help='Повторов на замер')
+        parser.add_argument('--fill', type=float, default=0.5, help='Доля занятых мест')
+        parser.add_argument('--seed', type=int, default=1)
+    
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        repeat = options['repeat']
+        results = []
+        
+        for number, (rows, seats_per_row) in enumerate(HALL_SIZES, start=1):
+            seat_map = SeatMap(rows, seats_per_row)
+            for row, seat, _ in list(seat_map.iter_seats()):
+                if rng.random() < options['fill']:
+                    seat_map.mark(row, seat)
+            
+            # Несохраненный сеанс с отрицательным id, чтобы не задеть кэш настоящих сеансов;
+            # схема занятости кладется в кэш заранее, поэтому сборка фрагмента обходится без БД
+            session = Session(pk=-number, hall=Hall(seats_rows=rows, seats_per_row=seats_per_row))
+            keys = [
+                seatmap.fragment_key(session.pk), occupancy.cache_key(session.pk),
+                occupancy.version_key(session.pk), occupancy.expiry_key(session.pk),
+            ]
+            cache.delete_many(keys)
+            
+            def miss():
+                cache.delete(keys[0])
+                version = occupancy.get_version(session.pk)
+                cache.set(occupancy.cache_key(session.pk), (version,) + seat_map.dumps(), occupancy.CACHE_TIMEOUT)
+                return seatmap.get_html(session)
+            
+            try:
+                html = miss()
+                if html != seatmap.render(seat_map):
+                    raise CommandError(f'Фрагмент из кэша не совпал с render() для зала {rows}x{seats_per_row}')
+                
+                with CaptureQueriesContext(connection) as captured:
+                    hit_ms = timed(lambda: seatmap.get_html(session), repeat)
+                results.append({
+                    'seats': seat_map.total_seats,
+                    'template_ms': timed(lambda: TEMPLATE_SEAT_MAP.render(Context({'seat_rows': seat_rows(seat_map)})), repeat),
+                    'render_ms': timed(lambda: seatmap.render(seat_map), repeat),
+                    'cache_miss_ms': timed(miss, repeat),
+                    'cache_hit_ms': hit_ms,
+                    'cache_hit_queries': len(captured),
+                    'fragment_bytes': len(html.encode()),
+                })
+            finally:
+                cache.delete_many(keys)
+        
+        self.stdout.write(json.dumps(results, indent=2))
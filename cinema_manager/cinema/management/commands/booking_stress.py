@@ -0,0 +1,134 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, IntegrityError
+from django.db.models import Count
+from cinema.booking import book_seats
+from cinema.booking_queue import get_queue
+from cinema.models import Session, Ticket, User
+from cinema.occupancy import build_seat_map
+from cinema.utils import calculate_final_price, percentile
+
+def legacy_book(session, user, row, seat):
+    # Прежний путь: проверка exists(), затем save(); при гонке IntegrityError уходит в 500
+    if Ticket.objects.filter(session=session, row=row, seat=seat).exists():
+        return 'conflict'
+    Ticket.objects.create(
+        session=session, user=user, row=row, seat=seat,
+        price=calculate_final_price(session.base_price, user)
+    )
+    return 'booked'
+
+def insert_book(session, user, row, seat):
+    result = book_seats(session, user, [(row, seat)])
+    return 'booked' if result.created else 'conflict'
+
+def queue_book(session, user, row, seat):
+    # Групповая запись через поток cinema.booking_queue, независимо от CINEMA_BOOKING_QUEUE
+    result = get_queue().submit(session, user, [(row, seat)])
+    return 'booked' if result.created else 'conflict'
+
+STRATEGIES = {
+    'check-then-insert': legacy_book,
+    'insert': insert_book,
+    'queue': queue_book,
+}
+
+# Наборы стратегий: both - две исходные, как в прежних запусках, all - все
+STRATEGY_GROUPS = {
+    'both': ['check-then-insert', 'insert'],
+    'all': sorted(STRATEGIES),
+}
+
+class Command(BaseCommand):
+    help = 'Потоки одновременно бронируют одни и те же места; считает 500, двойные продажи и пропускную способность'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session', type=int, help='id сеанса, по умолчанию самый поздний')
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--seats', type=int, default=20, help='Сколько свободных мест разыгрывается')
+        parser.add_argument('--attempts', type=int, default=50, help='Попыток на поток')
+        parser.add_argument('--strategy', choices=sorted(STRATEGIES) + sorted(STRATEGY_GROUPS), default='both')
+
+    def handle(self, *args, **options):
+        sessions = Session.objects.select_related('hall')
+        session = sessions.filter(pk=options['session']).first() if options['session'] else sessions.last()
+        if session is None:
+            raise CommandError('Сеанс не найден')
+
+        free_seats = build_seat_map(session).free_seats()[:options['seats']]
+        if not free_seats:
+            raise CommandError('В сеансе нет свободных мест')
+
+        strategies = STRATEGY_GROUPS.get(options['strategy'], [options['strategy']])
+        results = {}
+        for name in strategies:
+            results[name] = self.run(session, free_seats, STRATEGIES[name], options['threads'], options['attempts'])
+
+        self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+
+    def run(self, session, seats, strategy, threads, attempts):
+        # Отдельный пользователь на прогон: его билеты удаляются вместе с ним
+        user = User.objects.create_user(f'stress-{uuid.uuid4().hex[:12]}')
+        outcomes = Counter()
+        latencies = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def worker(seed):
+            rng = random.Random(seed)
+            local_outcomes, local_latencies = Counter(), []
+            barrier.wait()
+            try:
+                for _ in range(attempts):
+                    row, seat = rng.choice(seats)
+                    started = time.perf_counter()
+                    try:
+                        outcome = strategy(session, user, row, seat)
+                    except IntegrityError:
+                        outcome = 'error_500'
+                    except Exception:
+                        outcome = 'error_other'
+                    local_latencies.append(time.perf_counter() - started)
+                    local_outcomes[outcome] += 1
+            finally:
+                connections.close_all()
+            with lock:
+                outcomes.update(local_outcomes)
+                latencies.extend(local_latencies)
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        sold = Ticket.objects.filter(session=session, user=user)
+        double_sold = sold.values('row', 'seat').annotate(n=Count('id')).filter(n__gt=1).count()
+        sold_count = sold.count()
+        user.delete()
+
+        latencies.sort()
+        total = threads * attempts
+        return {
+            'attempts': total,
+            'booked': outcomes['booked'],
+            'conflicts': outcomes['conflict'],
+            'errors_500': outcomes['error_500'],
+            'errors_other': outcomes['error_other'],
+            'tickets_sold': sold_count,
+            'double_sold': double_sold,
+            'seconds': round(elapsed, 3),
+            'attempts_per_second': round(total / elapsed, 1),
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50) * 1000, 2),
+                'p95': round(percentile(latencies, 95) * 1000, 2),
+                'p99': round(percentile(latencies, 99) * 1000, 2),
+            },
+        }
@@ -0,0 +1,84 @@
+import json
+import re
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Value
+from django.utils import timezone
+from cinema.models import DailySales, Hall, Session, Ticket, User
+from cinema.reports import local_day_range, paid_tickets_between
+
+def mysql_full_scans(node):
+    # В JSON-плане MySQL полный просмотр - это access_type "ALL"
+    if isinstance(node, dict):
+        if node.get('access_type') == 'ALL':
+            yield node.get('table_name')
+        for value in node.values():
+            yield from mysql_full_scans(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from mysql_full_scans(value)
+
+def full_scan_tables(plan, vendor):
+    # Таблицы, которые план читает целиком, без индекса
+    if vendor == 'sqlite':
+        return set(re.findall(r'\bSCAN (\w+)(?! USING)(?:$|\s)', plan, re.MULTILINE))
+    if vendor == 'mysql':
+        return set(mysql_full_scans(json.loads(plan)))
+    if vendor == 'postgresql':
+        return set(re.findall(r'Seq Scan on (\w+)', plan))
+    raise CommandError(f'EXPLAIN для {vendor} не поддерживается')
+
+class Command(BaseCommand):
+    help = 'Проверяет по EXPLAIN, что ключевые запросы отчетов и расписания идут по индексам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Ширина проверяемого диапазона дат')
+        parser.add_argument('--show-plans', action='store_true')
+
+    def queries(self, days):
+        now = timezone.now()
+        today = timezone.localdate()
+        range_start, range_end = local_day_range(today - timedelta(days=days), today)
+        hall = Hall.objects.order_by('pk').first()
+        session = Session.objects.order_by('pk').first()
+        user = User.objects.filter(ticket__isnull=False).order_by('pk').first()
+        if not (hall and session and user):
+            raise CommandError('В базе нет залов, сеансов или билетов для проверки')
+
+        return {
+            # Выгрузка билетов: оплаченные за период, пачками по (purchase_time, id)
+            'ticket_export': paid_tickets_between(range_start, range_end).order_by('purchase_time', 'id')[:2000],
+            'sales_report': DailySales.objects.filter(
+                day__gte=today - timedelta(days=days), day__lte=today
+            ),
+            # Value(True), как в reports.paid_tickets_between: иначе SQLite не берет (session, is_paid)
+            'session_paid_tickets': Ticket.objects.filter(session=session, is_paid=Value(True)),
+            'seat_map': Ticket.objects.filter(session_id=session.pk).values_list('row', 'seat'),
+            'hall_schedule': Session.objects.filter(
+                hall=hall, start_time__gte=range_start, start_time__lt=range_end
+            ),
+            'upcoming_schedule': Session.objects.filter(start_time__gte=now).order_by('start_time', 'id')[:10],
+            'movie_schedule': Session.objects.filter(movie_id=session.movie_id, start_time__gte=now).order_by('start_time', 'id'),
+            'ticket_history': Ticket.objects.filter(user=user).order_by('-purchase_time', '-id')[:21],
+        }
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        explain_options = {'format': 'json'} if vendor == 'mysql' else {}
+
+        results = {}
+        failed = []
+        for name, queryset in self.queries(options['days']).items():
+            plan = queryset.explain(**explain_options)
+            full_scans = sorted(full_scan_tables(plan, vendor))
+            results[name] = {'full_scans': full_scans}
+            if options['show_plans']:
+                results[name]['plan'] = plan
+            if full_scans:
+                failed.append(name)
+
+        self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+        if failed:
+            raise CommandError(f'Полный просмотр таблицы в запросах: {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS('Все запросы используют индексы'))
\ No newline at end of file
@@ -0,0 +1,179 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from cinema.models import ArchivedTicket, DailySales, Discount, Hall, Movie, SeatHold, Session, Ticket, User
+from cinema import rollups
+
+GENRES = ['Драма', 'Комедия', 'Фантастика', 'Боевик', 'Мультфильм', 'Триллер']
+HALL_SIZES = [(8, 12), (10, 16), (12, 20), (14, 24), (18, 30)]
+# Постер из репозитория, варианты создаются при первом запросе
+POSTER = 'movie_posters/Interstellar_2014.jpg'
+PRICES = [Decimal(price) for price in ('250.00', '300.00', '350.00', '400.00', '450.00', '500.00')]
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими залами, сеансами и билетами для нагрузочных замеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--halls', type=int, default=20)
+        parser.add_argument('--movies', type=int, default=60)
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--days', type=int, default=60, help='Сеансы на столько дней: половина в прошлом, половина впереди')
+        parser.add_argument('--sessions-per-day', type=int, default=6, help='Сеансов в день на зал')
+        parser.add_argument('--fill', type=float, default=0.5, help='Доля проданных мест прошедших сеансов')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--force', action='store_true', help='Разрешить запуск не на SQLite')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' and not options['force']:
+            raise CommandError('Данные удаляются и создаются заново; для не-SQLite базы укажите --force')
+
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        self.clear()
+        movies = self.create_movies(rng, options['movies'])
+        halls = self.create_halls(rng, options['halls'])
+        users = self.create_users(rng, options['users'], batch_size)
+        sessions = self.create_sessions(rng, movies, halls, options['days'], options['sessions_per_day'], batch_size)
+        tickets = self.create_tickets(rng, sessions, halls, users, options['fill'], batch_size)
+        self.create_discounts()
+
+        rollup_rows = rollups.rebuild(batch_size=batch_size)
+        cache.clear()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Фильмов: {len(movies)}, залов: {len(halls)}, пользователей: {len(users)}, '
+            f'сеансов: {len(sessions)}, билетов: {tickets}, строк DailySales: {rollup_rows} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
+
+    def clear(self):
+        # Сырые DELETE без каскада и сигналов: на миллионах билетов обычный delete() слишком долог.
+        # Сигналы не нужны: таблицы очищаются целиком в порядке зависимостей, DailySales
+        # пересобирается после заполнения, а кэш схем и афиши сбрасывается в конце handle()
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model in (SeatHold, ArchivedTicket, Ticket, DailySales, Session, Discount, Movie, Hall):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+            User.objects.filter(username__startswith='bench-').delete()
+
+    def create_movies(self, rng, count):
+        movies = [
+            Movie(
+                title=f'Фильм {i}', description='Описание', duration=rng.choice([90, 105, 120, 135, 150]),
+                poster=POSTER, age_rating=rng.choice([0, 6, 12, 16, 18]), genre=rng.choice(GENRES),
+                director=f'Режиссер {i % 17}', release_date=date(2020, 1, 1) + timedelta(days=i * 20)
+            )
+            for i in range(1, count + 1)
+        ]
+        return Movie.objects.bulk_create(movies)
+
+    def create_halls(self, rng, count):
+        halls = [
+            Hall(name=f'Зал {i}', seats_rows=rows, seats_per_row=seats)
+            for i, (rows, seats) in enumerate((rng.choice(HALL_SIZES) for _ in range(count)), start=1)
+        ]
+        return Hall.objects.bulk_create(halls)
+
+    def create_users(self, rng, count, batch_size):
+        password = make_password('bench')
+        today = date.today()
+        users = [
+            User(
+                username=f'bench-{i}', password=password,
+                birth_date=today - timedelta(days=rng.randint(14 * 365, 85 * 365)) if rng.random() < 0.7 else None
+            )
+            for i in range(1, count + 1)
+        ]
+        User.objects.bulk_create(users, batch_size=batch_size)
+        return list(User.objects.filter(username__startswith='bench-').values_list('pk', flat=True))
+
+    def create_sessions(self, rng, movies, halls, days, per_day, batch_size):
+        # Сеансы без пересечений: в каждом зале подряд с 10:00 с перерывом на уборку
+        today = timezone.localtime().replace(hour=10, minute=0, second=0, microsecond=0)
+        sessions = []
+        for day in range(-(days // 2), days - days // 2):
+            for hall in halls:
+                start_time = today + timedelta(days=day, minutes=rng.choice([0, 15, 30]))
+                for _ in range(per_day):
+                    movie = rng.choice(movies)
+                    end_time = start_time + timedelta(minutes=movie.duration)
+                    sessions.append(Session(
+                        movie=movie, hall=hall, start_time=start_time, end_time=end_time,
+                        base_price=rng.choice(PRICES)
+                    ))
+                    start_time = end_time + timedelta(minutes=20)
+        Session.objects.bulk_create(sessions, batch_size=batch_size)
+        return list(Session.objects.values_list('pk', 'hall_id', 'start_time', 'base_price'))
+
+    def create_tickets(self, rng, sessions, halls, users, fill, batch_size):
+        # Прошедшие сеансы заполнены на fill, будущие - пропорционально близости к началу
+        sizes = {hall.pk: (hall.seats_rows, hall.seats_per_row) for hall in halls}
+        now = timezone.now()
+        created = 0
+        batch = []
+        for session_id, hall_id, start_time, base_price in sessions:
+            rows, per_row = sizes[hall_id]
+            days_left = (start_time - now).days
+            session_fill = fill if days_left < 0 else fill * max(0.05, 1 - days_left / 30)
+            sold = int(rows * per_row * session_fill * rng.uniform(0.6, 1.2))
+            for index in rng.sample(range(rows * per_row), min(sold, rows * per_row)):
+                # Покупка за 5 минут - 2 недели до начала, но не позже текущего момента
+                purchase_time = start_time - timedelta(minutes=rng.randint(5, 60 * 24 * 14))
+                if purchase_time > now:
+                    purchase_time = now - timedelta(minutes=rng.randint(0, 60 * 24 * 14))
+                batch.append(Ticket(
+                    session_id=session_id, user_id=rng.choice(users),
+                    row=index // per_row + 1, seat=index % per_row + 1, price=base_price,
+                    purchase_time=purchase_time, is_paid=rng.random() < 0.9
+                ))
+                if len(batch) >= batch_size:
+                    created += self.flush_tickets(batch)
+        return created + self.flush_tickets(batch)
+
+    def flush_tickets(self, batch):
+        # bulk_create проставит purchase_time текущим временем (auto_now_add), поэтому
+        # задуманное время покупки записывается вторым шагом. Один UPDATE через executemany
+        # вместо bulk_update: CASE из тысяч When собирается в Python дольше самой вставки
+        purchase_times = [ticket.purchase_time for ticket in batch]
+        with transaction.atomic():
+            Ticket.objects.bulk_create(batch)
+            if batch and batch[0].pk is None:
+                # MySQL не возвращает id вставленных строк: находим их по (сеанс, ряд, место)
+                ids = {
+                    (session_id, row, seat): pk
+                    for pk, session_id, row, seat in Ticket.objects.filter(
+                        session_id__in={ticket.session_id for ticket in batch}
+                    ).values_list('pk', 'session_id', 'row', 'seat')
+                }
+                for ticket in batch:
+                    ticket.pk = ids[(ticket.session_id, ticket.row, ticket.seat)]
+
+            table = connection.ops.quote_name(Ticket._meta.db_table)
+            column = connection.ops.quote_name(Ticket._meta.get_field('purchase_time').column)
+            pk_column = connection.ops.quote_name(Ticket._meta.pk.column)
+            with connection.cursor() as cursor:
+                cursor.executemany(f'UPDATE {table} SET {column} = %s WHERE {pk_column} = %s', [
+                    (connection.ops.adapt_datetimefield_value(purchase_time), ticket.pk)
+                    for ticket, purchase_time in zip(batch, purchase_times)
+                ])
+        count = len(batch)
+        batch.clear()
+        return count
+
+    def create_discounts(self):
+        now = timezone.now()
+        Discount.objects.bulk_create([
+            Discount(
+                name=f'Скидка {percent}%', description='', discount_percent=percent, code=f'BENCH{percent}',
+                valid_from=now - timedelta(days=30), valid_to=now + timedelta(days=30)
+            )
+            for percent in (5, 10, 20, 50)
+        ])
\ No newline at end of file
@@ -0,0 +1,27 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from cinema.schedule_import import import_schedule
+
+class Command(BaseCommand):
+    help = 'Импортирует сеансы из CSV (movie, hall, start_time, base_price), пропуская пересечения в залах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к CSV-файлу')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить, ничего не создавая')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+                result = import_schedule(lines, dry_run=options['dry_run'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(json.dumps({
+            'created': 0 if options['dry_run'] else len(result.created),
+            'valid': len(result.created),
+            'conflicts': result.conflicts,
+            'errors': result.errors,
+            'seconds': round(time.perf_counter() - started, 3),
+        }, ensure_ascii=False, indent=2))
\ No newline at end of file
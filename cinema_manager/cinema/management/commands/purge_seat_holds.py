@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from cinema.holds import purge_expired
+
+class Command(BaseCommand):
+    help = 'Удаляет истекшие удержания мест пачками; с --loop работает как фоновый сборщик'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-batches', type=int, help='Не больше N пачек за проход')
+        parser.add_argument('--loop', action='store_true', help='Повторять проход каждые --interval секунд')
+        parser.add_argument('--interval', type=float, default=30)
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge_expired(options['batch_size'], options['max_batches'])
+            if purged or options['verbosity'] > 1:
+                self.stdout.write(f'Удалено истекших удержаний: {purged}')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from cinema.reports import parse_report_date
+from cinema import rollups
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневные итоги продаж (DailySales) по таблице билетов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Первый день диапазона, YYYY-MM-DD')
+        parser.add_argument('--end', help='Последний день диапазона, YYYY-MM-DD')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            start_date = parse_report_date(options['start']) if options['start'] else None
+            end_date = parse_report_date(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f'Неверная дата: {e}')
+
+        if start_date and end_date and start_date > end_date:
+            raise CommandError('Начало диапазона позже его конца')
+
+        created = rollups.rebuild(start_date, end_date, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано строк: {created}'))
@@ -0,0 +1,163 @@
+import itertools
+import json
+import subprocess
+import time
+from datetime import timedelta
+from io import StringIO
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from cinema import analytics
+from cinema.models import ArchivedTicket, DailySales, Movie, Session, Ticket, User
+from cinema.reports import generate_sales_report, iter_ticket_rows
+from cinema.utils import percentile
+
+REPORT_TYPES = ('daily', 'weekly', 'monthly', 'by_movie', 'by_hall')
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def summarize(latencies, queries, elapsed):
+    latencies = sorted(latency * 1000 for latency in latencies)
+    queries = sorted(queries)
+    return {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'throughput_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'latency_ms': {p: round(percentile(latencies, n), 2) for p, n in (('p50', 50), ('p95', 95), ('p99', 99))},
+        'queries': {'p50': percentile(queries, 50), 'max': queries[-1]},
+    }
+
+class Command(BaseCommand):
+    help = 'Прогоняет сценарии нагрузки и выводит пропускную способность, перцентили и число запросов в JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=5, help='Запросов на прогрев перед замером')
+        parser.add_argument('--scenarios', nargs='*', help='Запустить только эти сценарии')
+        parser.add_argument('--booking-threads', type=int, default=8)
+        parser.add_argument('--output', help='Записать результат в файл вместо stdout')
+
+    def handle(self, *args, **options):
+        upcoming = list(
+            Session.objects.filter(start_time__gte=timezone.now()).order_by('start_time').values_list('pk', flat=True)[:200]
+        )
+        movies = list(Movie.objects.values_list('pk', flat=True))
+        user = User.objects.filter(username__startswith='bench-').order_by('pk').first()
+        if not (upcoming and movies and user):
+            raise CommandError('Нет данных для замеров, запустите generate_bench_data')
+
+        self.anonymous = Client()
+        self.customer = Client()
+        self.customer.force_login(user)
+        self.upcoming = itertools.cycle(upcoming)
+        self.movies = itertools.cycle(movies)
+        # Опрос схемы идет по небольшому числу сеансов, как у открытых вкладок покупателей
+        self.polled = itertools.cycle(upcoming[:20])
+        self.etags = {}
+        for session_id in upcoming[:20]:
+            self.check_seats(session_id)
+
+        scenarios = self.scenarios()
+        selected = options['scenarios'] or list(scenarios) + ['booking_contention']
+        unknown = set(selected) - set(scenarios) - {'booking_contention'}
+        if unknown:
+            raise CommandError(f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+
+        results = {}
+        for name in selected:
+            if name == 'booking_contention':
+                results[name] = self.booking_contention(options['booking_threads'])
+                continue
+            func, iterations = scenarios[name]
+            iterations = iterations or options['iterations']
+            results[name] = self.measure(func, iterations, options['warmup'])
+            self.stderr.write(f'{name}: p50 {results[name]["latency_ms"]["p50"]} мс')
+
+        output = json.dumps({
+            'meta': {
+                'commit': git_commit(),
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'sessions': Session.objects.count(),
+                'tickets': Ticket.objects.count(),
+                'archived_tickets': ArchivedTicket.objects.count(),
+                'daily_sales_rows': DailySales.objects.count(),
+            },
+            'scenarios': results,
+        }, ensure_ascii=False, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+    def scenarios(self):
+        # имя -> (функция одного запроса, число повторов или None для --iterations)
+        today = timezone.localdate()
+        # Первый день продаж по сводке: после archive_tickets ранние билеты лежат в архиве
+        first_day = DailySales.objects.order_by('day').values_list('day', flat=True).first() or today
+        scenarios = {
+            'home': (lambda: self.get(self.anonymous, reverse('cinema:home')), None),
+            'movie_detail': (lambda: self.get(self.anonymous, reverse('cinema:movie_detail', args=[next(self.movies)])), None),
+            'session_seat_map': (
+                lambda: self.get(self.customer, reverse('cinema:session_detail', args=[next(self.upcoming)])), None
+            ),
+            'check_seats_full': (lambda: self.check_seats(next(self.polled)), None),
+            'check_seats_poll': (lambda: self.check_seats(next(self.polled), conditional=True), None),
+            # Выгрузка дня билетов тяжелее остальных сценариев, поэтому повторов меньше
+            'ticket_export_day': (lambda: sum(1 for _ in iter_ticket_rows(today, today)), 10),
+            # Аналитика заполняемости читает все билеты месяца, поэтому повторов еще меньше
+            'analytics_fill_rate_month': (
+                lambda: analytics.generate_report(today - timedelta(days=30), today, 'fill_rate'), 3
+            ),
+        }
+        for report_type in REPORT_TYPES:
+            scenarios[f'report_{report_type}'] = (
+                lambda report_type=report_type: generate_sales_report(first_day, today, report_type), None
+            )
+        return scenarios
+
+    def get(self, client, url, **headers):
+        response = client.get(url, headers=headers)
+        if response.status_code not in (200, 304):
+            raise CommandError(f'{url}: HTTP {response.status_code}')
+        return response
+
+    def check_seats(self, session_id, conditional=False):
+        url = reverse('cinema:check_seat_availability', args=[session_id])
+        headers = {'If-None-Match': self.etags[session_id]} if conditional and session_id in self.etags else {}
+        response = self.get(self.anonymous, url, **headers)
+        self.etags[session_id] = response['ETag']
+
+    def measure(self, func, iterations, warmup):
+        for _ in range(warmup):
+            func()
+
+        latencies, queries = [], []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                func()
+                latencies.append(time.perf_counter() - request_started)
+            queries.append(len(captured))
+        return summarize(latencies, queries, time.perf_counter() - started)
+
+    def booking_contention(self, threads):
+        # Потоки бронируют одни и те же места через booking.book_seats
+        output = StringIO()
+        call_command('booking_stress', strategy='insert', threads=threads, attempts=25, stdout=output)
+        return json.loads(output.getvalue())['insert']
\ No newline at end of file
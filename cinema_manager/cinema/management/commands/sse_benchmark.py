@@ -0,0 +1,99 @@
+import asyncio
+import json
+import resource
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from cinema.events import get_broker, publish_seats
+from cinema.models import Session
+from cinema import occupancy
+from cinema.utils import percentile
+
+class Command(BaseCommand):
+    help = 'Открывает N подключений к потоку SSE схемы зала в одном процессе и замеряет рассылку события'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000)
+        parser.add_argument('--session', type=int, help='id сеанса, по умолчанию первый')
+        parser.add_argument('--timeout', type=float, default=60)
+
+    def handle(self, *args, **options):
+        result = asyncio.run(self.run(options['session'], options['connections'], options['timeout']))
+        self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+
+    async def run(self, session_id, connections, timeout):
+        sessions = Session.objects.filter(pk=session_id) if session_id else Session.objects.all()
+        session_id = await sessions.values_list('pk', flat=True).afirst()
+        if session_id is None:
+            raise CommandError('Нет сеансов для подключения')
+
+        app = ASGIHandler()
+        path = f'/sessions/{session_id}/events/'
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'localhost')],
+            'server': ('localhost', 80),
+            'client': ('127.0.0.1', 0),
+        }
+        connected = asyncio.Event()
+        delivered = asyncio.Event()
+        state = {'connected': 0, 'delivered': [], 'marker': None, 'published_at': None}
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        def make_send():
+            async def send(message):
+                body = message.get('body', b'')
+                if b'event: seats' not in body:
+                    return
+                if state['marker'] and state['marker'] in body:
+                    state['delivered'].append(time.perf_counter() - state['published_at'])
+                    if len(state['delivered']) == connections:
+                        delivered.set()
+                else:
+                    state['connected'] += 1
+                    if state['connected'] == connections:
+                        connected.set()
+            return send
+
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(app(dict(scope), receive, make_send())) for _ in range(connections)]
+        try:
+            await asyncio.wait_for(connected.wait(), timeout)
+            connect_seconds = time.perf_counter() - started
+
+            version = await sync_to_async(occupancy.get_version)(session_id) + 1
+            state['marker'] = f'id: {version}\n'.encode()
+            state['published_at'] = time.perf_counter()
+            await sync_to_async(publish_seats)(session_id, version, [(1, 1)], [])
+            await asyncio.wait_for(delivered.wait(), timeout)
+        finally:
+            open_connections = get_broker().connection_count()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        latencies = sorted(state['delivered'])
+        return {
+            'connections': connections,
+            'open_connections': open_connections,
+            'threads': threading.active_count(),
+            'connect_seconds': round(connect_seconds, 3),
+            'fanout_ms': {
+                'p50': round(percentile(latencies, 50) * 1000, 2),
+                'p99': round(percentile(latencies, 99) * 1000, 2),
+                'max': round(latencies[-1] * 1000, 2),
+            },
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
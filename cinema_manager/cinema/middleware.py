@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from .utils import percentile
+
+logger = logging.getLogger(__name__)
+
+# Один и тот же SQL (без параметров) столько раз за запрос - признак N+1
+DUPLICATE_QUERY_THRESHOLD = 3
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+def query_budget(max_queries):
+    # Объявляет, сколько SQL-запросов может сделать представление за один запрос
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def duplicates(self):
+        return {sql: n for sql, n in self.statements.items() if n >= DUPLICATE_QUERY_THRESHOLD}
+
+# Замер текущего запроса. ContextVar копируется в потоки sync_to_async, поэтому
+# запросы синхронных представлений под ASGI попадают в замер того же запроса
+_recorder = ContextVar('cinema_query_recorder', default=None)
+
+def record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+def instrument(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+def instrument_connections():
+    # Соединения потока, в котором выполнится представление
+    for connection in connections.all():
+        instrument(connection)
+
+# Соединения, открытые в других потоках (sync_to_async в асинхронных представлениях)
+connection_created.connect(instrument)
+
+class PerformanceStats:
+    # Скользящее окно последних замеров по каждому представлению
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, view_name, wall_time, queries, sql_time, duplicates):
+        with self.lock:
+            samples = self.samples.setdefault(view_name, deque(maxlen=self.window))
+            samples.append((wall_time, queries, sql_time, duplicates))
+
+    def summary(self):
+        with self.lock:
+            snapshot = {name: list(samples) for name, samples in self.samples.items()}
+
+        result = {}
+        for name, samples in sorted(snapshot.items()):
+            wall = sorted(sample[0] * 1000 for sample in samples)
+            sql = sorted(sample[2] * 1000 for sample in samples)
+            queries = sorted(sample[1] for sample in samples)
+            result[name] = {
+                'requests': len(samples),
+                'wall_ms': {p: round(percentile(wall, n), 2) for p, n in (('p50', 50), ('p95', 95), ('p99', 99))},
+                'sql_ms': {p: round(percentile(sql, n), 2) for p, n in (('p50', 50), ('p95', 95), ('p99', 99))},
+                'queries': {'p50': percentile(queries, 50), 'p99': percentile(queries, 99), 'max': queries[-1]},
+                'requests_with_duplicates': sum(1 for sample in samples if sample[3]),
+            }
+        return result
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+
+stats = PerformanceStats(getattr(settings, 'CINEMA_PERFORMANCE_WINDOW', 1000))
+
+class QueryInstrumentationMiddleware:
+    # Время ответа, число и время SQL-запросов по имени представления (cinema:home, ...)
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.strict = getattr(settings, 'CINEMA_QUERY_BUDGET_STRICT', False)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            instrument_connections()
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        self.finish(request, time.perf_counter() - started, recorder)
+        return response
+
+    async def __acall__(self, request):
+        # Под ASGI синхронные представления выполняются через sync_to_async в общем
+        # потоке (thread_sensitive): его соединения подключаются к замеру заранее
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            await sync_to_async(instrument_connections)()
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        self.finish(request, time.perf_counter() - started, recorder)
+        return response
+
+    def finish(self, request, wall_time, recorder):
+        match = request.resolver_match
+        if match is None:
+            return
+
+        view_name = match.view_name
+        queries = recorder.count
+        duplicates = recorder.duplicates()
+        stats.record(view_name, wall_time, queries, recorder.sql_time, bool(duplicates))
+
+        for sql, n in duplicates.items():
+            logger.warning('%s: запрос выполнен %d раз (возможен N+1): %s', view_name, n, sql)
+
+        budget = getattr(match.func, 'query_budget', None)
+        if budget is not None and queries > budget:
+            message = f'{view_name}: {queries} SQL-запросов при бюджете {budget}'
+            if self.strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
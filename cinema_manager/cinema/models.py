@@ -62,6 +62,14 @@ class Session(models.Model):
         verbose_name = 'Сеанс'
         verbose_name_plural = 'Сеансы'
         ordering = ['start_time']
+        indexes = [
+            # Постраничный вывод прошедших сеансов по (start_time, id)
+            models.Index(fields=['start_time', 'id'], name='session_start_id_idx'),
+            # Расписание зала за период
+            models.Index(fields=['hall', 'start_time'], name='session_hall_start_idx'),
+            # Предстоящие сеансы фильма для его страницы
+            models.Index(fields=['movie', 'start_time'], name='session_movie_start_idx'),
+        ]
     
     def __str__(self):
         return f"{self.movie.title} - {self.start_time.strftime('%d.%m.%Y %H:%M')}"
@@ -93,10 +101,64 @@ class Ticket(models.Model):
         verbose_name = 'Билет'
         verbose_name_plural = 'Билеты'
         unique_together = ('session', 'row', 'seat')
+        indexes = [
+            # История покупок пользователя постранично по (purchase_time, id)
+            models.Index(fields=['user', 'purchase_time', 'id'], name='ticket_user_purchase_idx'),
+            # Оплаченные билеты за период: отчеты, выгрузка, пересборка DailySales
+            models.Index(fields=['is_paid', 'purchase_time'], name='ticket_paid_purchase_idx'),
+            # Оплаченные билеты сеанса
+            models.Index(fields=['session', 'is_paid'], name='ticket_session_paid_idx'),
+        ]
     
     def __str__(self):
         return f"Билет на {self.session} - ряд {self.row}, место {self.seat}"
 
+class ArchivedTicket(models.Model):
+    # Билеты давно прошедших сеансов, перенесенные из Ticket командой archive_tickets.
+    # id совпадает с id исходного билета
+    id = models.BigIntegerField(primary_key=True)
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, verbose_name='Сеанс')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Пользователь')
+    row = models.PositiveIntegerField(verbose_name='Ряд')
+    seat = models.PositiveIntegerField(verbose_name='Место')
+    price = models.DecimalField(max_digits=8, decimal_places=2, verbose_name='Цена')
+    purchase_time = models.DateTimeField(verbose_name='Время покупки')
+    is_paid = models.BooleanField(default=False, verbose_name='Оплачен')
+    archived_at = models.DateTimeField(verbose_name='Перенесен в архив')
+    
+    class Meta:
+        verbose_name = 'Архивный билет'
+        verbose_name_plural = 'Архивные билеты'
+        indexes = [
+            # Архив в профиле постранично по (purchase_time, id)
+            models.Index(fields=['user', 'purchase_time', 'id'], name='archived_user_purchase_idx'),
+            # Выгрузка и пересборка DailySales
+            models.Index(fields=['is_paid', 'purchase_time'], name='archived_paid_purchase_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Билет на {self.session} - ряд {self.row}, место {self.seat}"
+
+class SeatHold(models.Model):
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, verbose_name='Сеанс')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Пользователь')
+    row = models.PositiveIntegerField(verbose_name='Ряд')
+    seat = models.PositiveIntegerField(verbose_name='Место')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    expires_at = models.DateTimeField(db_index=True, verbose_name='Действует до')
+    
+    class Meta:
+        verbose_name = 'Удержание места'
+        verbose_name_plural = 'Удержания мест'
+        unique_together = ('session', 'row', 'seat')
+    
+    def __str__(self):
+        return f"Удержание ряд {self.row}, место {self.seat} до {self.expires_at:%H:%M}"
+    
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
 class Discount(models.Model):
     name = models.CharField(max_length=100, verbose_name='Название')
     description = models.TextField(verbose_name='Описание')
@@ -118,4 +180,19 @@ class Discount(models.Model):
     
     def is_valid(self):
         now = timezone.now()
-        return self.is_active and self.valid_from <= now <= self.valid_to
\ No newline at end of file
+        return self.is_active and self.valid_from <= now <= self.valid_to
+
+class DailySales(models.Model):
+    day = models.DateField(verbose_name='День')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, verbose_name='Фильм')
+    hall = models.ForeignKey(Hall, on_delete=models.CASCADE, verbose_name='Зал')
+    tickets_count = models.IntegerField(default=0, verbose_name='Продано билетов')
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Выручка')
+    
+    class Meta:
+        verbose_name = 'Продажи за день'
+        verbose_name_plural = 'Продажи по дням'
+        unique_together = ('day', 'movie', 'hall')
+    
+    def __str__(self):
+        return f"{self.day:%d.%m.%Y} - {self.movie_id}/{self.hall_id}: {self.tickets_count}"
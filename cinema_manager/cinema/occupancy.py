@@ -0,0 +1,205 @@
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import SeatHold, Session, Ticket
+from . import events
+
+CACHE_TIMEOUT = 60 * 60
+# Сколько последних изменений хранится для ответов ?since=<версия>
+EVENTS_KEPT = 500
+
+def cache_key(session_id):
+    return f'cinema:occupancy:{session_id}'
+
+def version_key(session_id):
+    return f'cinema:occupancy:{session_id}:version'
+
+def event_key(session_id, version):
+    return f'cinema:occupancy:{session_id}:event:{version}'
+
+# Занятость мест сеанса: по биту на место, ряд за рядом
+class SeatMap:
+    def __init__(self, rows, seats_per_row, bits=None):
+        self.rows = rows
+        self.seats_per_row = seats_per_row
+        size = (rows * seats_per_row + 7) // 8
+        self.bits = bytearray(bits) if bits is not None else bytearray(size)
+
+    @property
+    def total_seats(self):
+        return self.rows * self.seats_per_row
+
+    def contains(self, row, seat):
+        return 1 <= row <= self.rows and 1 <= seat <= self.seats_per_row
+
+    def index(self, row, seat):
+        return (row - 1) * self.seats_per_row + (seat - 1)
+
+    def mark(self, row, seat, booked=True):
+        if not self.contains(row, seat):
+            return
+        i = self.index(row, seat)
+        if booked:
+            self.bits[i >> 3] |= 1 << (i & 7)
+        else:
+            self.bits[i >> 3] &= ~(1 << (i & 7))
+
+    def is_booked(self, row, seat):
+        i = self.index(row, seat)
+        return bool(self.bits[i >> 3] & (1 << (i & 7)))
+
+    def is_free(self, row, seat):
+        return self.contains(row, seat) and not self.is_booked(row, seat)
+
+    def booked_count(self):
+        return int.from_bytes(self.bits, 'little').bit_count()
+
+    def free_count(self):
+        return self.total_seats - self.booked_count()
+
+    def iter_seats(self):
+        bits = self.bits
+        i = 0
+        for row in range(1, self.rows + 1):
+            for seat in range(1, self.seats_per_row + 1):
+                yield row, seat, bool(bits[i >> 3] >> (i & 7) & 1)
+                i += 1
+
+    def booked_seats(self):
+        return [(row, seat) for row, seat, booked in self.iter_seats() if booked]
+
+    def free_seats(self):
+        return [(row, seat) for row, seat, booked in self.iter_seats() if not booked]
+
+    def dumps(self):
+        return (self.rows, self.seats_per_row, bytes(self.bits))
+
+    @classmethod
+    def loads(cls, value):
+        rows, seats_per_row, bits = value
+        return cls(rows, seats_per_row, bits)
+
+def new_version():
+    # Если счетчик выпал из кэша, новая версия будет больше любой выданной ранее,
+    # поэтому старые ETag не совпадут, а ?since= вернет полную схему
+    return int(time.time() * 1000)
+
+def expiry_key(session_id):
+    return f'cinema:occupancy:{session_id}:holds_expire'
+
+def read_version(session_id, cached, create=True):
+    # cached - результат get_many по version_key и expiry_key.
+    # Когда истекает ближайшее удержание, схема меняется без записи в БД,
+    # поэтому в этот момент версия поднимается при чтении.
+    # С create=False отсутствующая версия не заводится, а возвращается None:
+    # ключ версии хранится без срока, и заводить его можно только для существующего сеанса
+    version = cached.get(version_key(session_id))
+    expires_at = cached.get(expiry_key(session_id))
+    if expires_at is not None and expires_at <= time.time():
+        cache.delete(expiry_key(session_id))
+        version = bump_version(session_id)
+        events.publish_seats(session_id, version)
+    if version is None and create:
+        cache.add(version_key(session_id), new_version(), None)
+        version = cache.get(version_key(session_id))
+    return version
+
+def get_version(session_id, create=True):
+    keys = [version_key(session_id), expiry_key(session_id)]
+    return read_version(session_id, cache.get_many(keys), create)
+
+def bump_version(session_id):
+    try:
+        return cache.incr(version_key(session_id))
+    except ValueError:
+        cache.add(version_key(session_id), new_version(), None)
+        return cache.incr(version_key(session_id))
+
+def load_seat_map(session_id, version=None):
+    keys = [cache_key(session_id), version_key(session_id), expiry_key(session_id)]
+    cached = cache.get_many(keys)
+    version = version or read_version(session_id, cached)
+    entry = cached.get(keys[0])
+    # Схема, собранная до последнего изменения, считается промахом
+    if entry is None or entry[0] != version:
+        return None
+    return SeatMap.loads(entry[1:])
+
+def build_seat_map(session):
+    # Занятыми считаются проданные места и места с действующим удержанием
+    seat_map = SeatMap(session.hall.seats_rows, session.hall.seats_per_row)
+    for row, seat in Ticket.objects.filter(session_id=session.pk).values_list('row', 'seat'):
+        seat_map.mark(row, seat)
+
+    seat_map.holds_expire_at = None
+    holds = SeatHold.objects.filter(session_id=session.pk, expires_at__gt=timezone.now())
+    for row, seat, expires_at in holds.values_list('row', 'seat', 'expires_at'):
+        seat_map.mark(row, seat)
+        if seat_map.holds_expire_at is None or expires_at < seat_map.holds_expire_at:
+            seat_map.holds_expire_at = expires_at
+    return seat_map
+
+def get_seat_map(session):
+    version = get_version(session.pk)
+    seat_map = load_seat_map(session.pk, version)
+    if seat_map is None:
+        seat_map = build_seat_map(session)
+        cache.set(cache_key(session.pk), (version,) + seat_map.dumps(), CACHE_TIMEOUT)
+        if seat_map.holds_expire_at is not None:
+            cache.set(expiry_key(session.pk), seat_map.holds_expire_at.timestamp(), CACHE_TIMEOUT)
+    return seat_map
+
+def record_changes(session_id, booked=(), released=()):
+    booked, released = list(booked), list(released)
+
+    def publish():
+        version = bump_version(session_id)
+        cache.set(event_key(session_id, version), (booked, released), CACHE_TIMEOUT)
+        events.publish_seats(session_id, version, booked, released)
+
+    # Версию меняем после коммита, иначе схему могут пересобрать из незакоммиченных данных
+    transaction.on_commit(publish)
+
+def invalidate(*session_ids):
+    # Изменение без известного состава мест: клиенты с ?since= получат полную схему
+    def publish():
+        for session_id in session_ids:
+            events.publish_seats(session_id, bump_version(session_id))
+
+    transaction.on_commit(publish)
+
+def forget(session_id):
+    # Удаленный сеанс: без ключа версии опрос схемы снова проверяет сеанс в БД и отдает 404.
+    # После коммита и после публикаций каскадно удаленных билетов, которые подняли бы версию заново
+    def delete():
+        cache.delete_many([cache_key(session_id), version_key(session_id), expiry_key(session_id)])
+
+    transaction.on_commit(delete)
+
+def invalidate_hall(hall_id):
+    invalidate(*Session.objects.filter(hall_id=hall_id).values_list('pk', flat=True))
+
+def changes_since(session_id, since, version):
+    # Места, занятые и освобожденные после версии since, или None,
+    # если часть изменений уже не хранится и нужна полная схема
+    if since > version or version - since > EVENTS_KEPT:
+        return None
+
+    keys = [event_key(session_id, v) for v in range(since + 1, version + 1)]
+    events = cache.get_many(keys)
+    if len(events) != len(keys):
+        return None
+
+    state = {}
+    for key in keys:
+        booked, released = events[key]
+        for seat in released:
+            state[tuple(seat)] = False
+        for seat in booked:
+            state[tuple(seat)] = True
+
+    return (
+        sorted(seat for seat, booked in state.items() if booked),
+        sorted(seat for seat, booked in state.items() if not booked),
+    )
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import time
+from collections import namedtuple
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from . import routers, schedule
+
+# Сколько секунд держится блокировка пересборки и сколько ее ждут остальные запросы
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+
+# Собранная страница: поколение афиши, срок свежести (unix-время) и готовый ответ
+Page = namedtuple('Page', ['generation', 'expires_at', 'etag', 'last_modified', 'content_type', 'content'])
+
+def page_seconds():
+    return getattr(settings, 'CINEMA_PAGE_CACHE_SECONDS', 10 * 60)
+
+def page_key(view_name, args, kwargs):
+    parts = [str(arg) for arg in args] + [f'{name}={value}' for name, value in sorted(kwargs.items())]
+    return ':'.join(['cinema:page', view_name] + parts)
+
+def lock_key(key):
+    return f'{key}:lock'
+
+def lock_path(key):
+    # cache.add атомарен в Redis, Memcached и LocMem, а у файлового бэкенда это
+    # has_key + set: два процесса взяли бы блокировку вместе. Для него блокировка -
+    # файл, созданный с O_EXCL в каталоге кэша; для остальных бэкендов - None
+    options = settings.CACHES.get('default', {})
+    if options.get('BACKEND') != 'django.core.cache.backends.filebased.FileBasedCache':
+        return None
+    return os.path.join(options['LOCATION'], 'locks', hashlib.md5(key.encode()).hexdigest() + '.lock')
+
+def lock_file_expired(path):
+    # Файл процесса, упавшего во время пересборки, истекает, как ключ блокировки в кэше
+    try:
+        return time.time() - os.path.getmtime(path) >= LOCK_TIMEOUT
+    except FileNotFoundError:
+        return True
+
+def acquire_lock(key):
+    path = lock_path(key)
+    if path is None:
+        return cache.add(lock_key(key), 1, LOCK_TIMEOUT)
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            if not lock_file_expired(path):
+                return False
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return False
+
+def is_locked(key):
+    path = lock_path(key)
+    if path is None:
+        return cache.get(lock_key(key)) is not None
+    return not lock_file_expired(path)
+
+def release_lock(key):
+    path = lock_path(key)
+    if path is None:
+        cache.delete(lock_key(key))
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def is_fresh(page, generation):
+    # Страница устаревает при изменении фильмов, залов и сеансов (поколение афиши)
+    # и к началу ближайшего показанного на ней сеанса
+    return page is not None and page.generation == generation and time.time() < page.expires_at
+
+def store(request, key, generation, response, valid_until, previous):
+    # Кэшируются только обычные ответы 200; 404, редиректы и страницы
+    # с CSRF-токеном или cookie отдаются как есть
+    if (
+        response.status_code != 200 or response.streaming or response.cookies
+        or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    ):
+        return None
+    
+    now = time.time()
+    expires_at = now + page_seconds()
+    if valid_until is not None:
+        expires_at = min(expires_at, valid_until.timestamp())
+    
+    content = response.content
+    etag = f'"{hashlib.md5(content).hexdigest()}"'
+    # Пересобранная без изменений страница сохраняет прежний Last-Modified
+    last_modified = previous.last_modified if previous is not None and previous.etag == etag else int(now)
+    page = Page(generation, expires_at, etag, last_modified, response['Content-Type'], content)
+    # Устаревшая копия хранится дольше срока свежести: ее отдают, пока идет пересборка
+    cache.set(key, page, page_seconds() + LOCK_TIMEOUT)
+    return page
+
+def wait_for_page(key, generation):
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        page = cache.get(key)
+        if page is not None and page.generation == generation:
+            return page
+        if not is_locked(key):
+            # Пересборка закончилась, но ответ не кэшируется (например, 404)
+            return None
+    return None
+
+def page_response(request, page):
+    response = HttpResponse(page.content, content_type=page.content_type)
+    response['ETag'] = page.etag
+    response['Last-Modified'] = http_date(page.last_modified)
+    # Браузер хранит страницу, но каждый раз сверяется: ответ 304 не требует рендера
+    patch_cache_control(response, no_cache=True)
+    return get_conditional_response(request, etag=page.etag, last_modified=page.last_modified, response=response)
+
+def cache_anonymous_page(valid_until):
+    # Кэш страниц для анонимных посетителей (GET/HEAD). С Redis, Memcached или файловым
+    # бэкендом страницы и поколение афиши общие для процессов; LocMemCache годится только
+    # для одного процесса: изменение сбросит страницы лишь в нем (см. cinema.W001).
+    # valid_until(*args, **kwargs) - момент, когда страница устареет без изменений в БД
+    # (начало ближайшего сеанса) или None. Истекшую страницу пересобирает один запрос
+    # под блокировкой acquire_lock, остальные в это время получают прежнюю версию,
+    # а если ее нет - ждут новую
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            
+            key = page_key(view.__name__, args, kwargs)
+            generation = schedule.get_generation()
+            cached = cache.get(key)
+            if is_fresh(cached, generation):
+                return page_response(request, cached)
+            
+            if not acquire_lock(key):
+                page = cached or wait_for_page(key, generation)
+                if page is not None:
+                    return page_response(request, page)
+                return view(request, *args, **kwargs)
+            
+            try:
+                # Общая для всех страница собирается из основной базы, не из реплики
+                with routers.primary_reads():
+                    response = view(request, *args, **kwargs)
+                page = store(request, key, generation, response, valid_until(*args, **kwargs), cached)
+            finally:
+                release_lock(key)
+            return page_response(request, page) if page is not None else response
+        return wrapper
+    return decorator
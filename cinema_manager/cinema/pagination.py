@@ -0,0 +1,40 @@
+import base64
+from collections import namedtuple
+from datetime import datetime
+from django.db.models import Q
+
+PAGE_SIZE = 20
+
+# items - записи страницы, next_cursor - курсор следующей страницы или None
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor'])
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(value, pk):
+    raw = f'{value.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, pk = raw.split('|')
+        return datetime.fromisoformat(value), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor('Некорректный курсор страницы') from e
+
+def keyset_page(queryset, field, cursor=None, page_size=PAGE_SIZE):
+    # Страницы по убыванию (field, id): вместо OFFSET условие "после последней строки",
+    # поэтому любая страница читает из индекса столько же строк, сколько первая
+    queryset = queryset.order_by(f'-{field}', '-id')
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return KeysetPage(items, next_cursor)
\ No newline at end of file
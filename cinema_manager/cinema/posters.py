@@ -0,0 +1,117 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.urls import reverse
+from PIL import Image, ImageOps
+from . import schedule
+
+logger = logging.getLogger(__name__)
+
+# Варианты постера: наибольшие ширина и высота, качество JPEG
+VARIANTS = {
+    'card': (400, 600, 80),
+    'detail': (600, 900, 82),
+    'retina': (1200, 1800, 78),
+}
+VARIANTS_DIR = 'movie_posters/variants'
+# Через сколько секунд повторить генерацию после ошибки (битый или пропавший файл)
+FAILURE_RETRY_SECONDS = 5 * 60
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+def manifest_key(name):
+    return f'cinema:poster:{hashlib.md5(name.encode()).hexdigest()}'
+
+def variant_name(name, variant, digest):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{VARIANTS_DIR}/{stem}.{variant}.{digest}.jpg'
+
+def content_digest(data, variant):
+    # В хэш входят и параметры варианта: при их смене меняются имена файлов
+    return hashlib.sha256(data + repr(VARIANTS[variant]).encode()).hexdigest()[:12]
+
+def render_variant(image, variant):
+    width, height, quality = VARIANTS[variant]
+    resized = image.copy()
+    resized.thumbnail((width, height), Image.LANCZOS)
+    output = BytesIO()
+    resized.save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
+
+def generate_variants(name):
+    # Создает недостающие варианты и запоминает их имена; уже созданные файлы не пересчитываются
+    with default_storage.open(name, 'rb') as source:
+        data = source.read()
+
+    manifest = {variant: variant_name(name, variant, content_digest(data, variant)) for variant in VARIANTS}
+    missing = [variant for variant, path in manifest.items() if not default_storage.exists(path)]
+    if missing:
+        image = ImageOps.exif_transpose(Image.open(BytesIO(data))).convert('RGB')
+        for variant in missing:
+            # Имя определяется содержимым, поэтому параллельная запись дает тот же файл
+            default_storage.save(manifest[variant], ContentFile(render_variant(image, variant)))
+
+    cache.set(manifest_key(name), manifest, None)
+    return manifest
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'CINEMA_POSTER_WORKERS', 2),
+                thread_name_prefix='poster'
+            )
+        return _executor
+
+def _generate(name):
+    try:
+        generate_variants(name)
+    except Exception:
+        logger.exception('Не удалось создать варианты постера %s', name)
+        # Пустой список вариантов: до повторной попытки отдается оригинал
+        cache.set(manifest_key(name), {}, FAILURE_RETRY_SECONDS)
+    else:
+        # Закэшированные страницы афиши (cinema.pagecache) ссылаются на оригинал постера
+        schedule.invalidate()
+    finally:
+        with _executor_lock:
+            _pending.discard(name)
+
+def schedule_variants(name):
+    # Генерация в фоновом пуле: загрузка постера в админке не ждет пережатия
+    if not name:
+        return
+    with _executor_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    get_executor().submit(_generate, name)
+
+def schedule_after_commit(name):
+    transaction.on_commit(lambda: schedule_variants(name))
+
+def variant_path(filename):
+    return f'{VARIANTS_DIR}/{filename}'
+
+def poster_url(name, variant='card'):
+    # URL варианта, а пока его нет - оригинал, и генерация ставится в очередь
+    name = getattr(name, 'name', name)
+    if not name:
+        return ''
+    manifest = cache.get(manifest_key(name))
+    if manifest is None:
+        schedule_variants(name)
+    if not manifest or variant not in manifest:
+        return default_storage.url(name)
+    return reverse('cinema:poster_variant', args=[os.path.basename(manifest[variant])])
\ No newline at end of file
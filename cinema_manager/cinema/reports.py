@@ -1,130 +1,210 @@
-from django.db.models import Sum, Count
+import heapq
+from django.db.models import Q, Sum, Value
 from django.utils import timezone
-from .models import Ticket
-from datetime import datetime, timedelta
+from .models import ArchivedTicket, DailySales, Ticket
+from datetime import date, datetime, time, timedelta
+
+def parse_report_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def local_day_range(start_date, end_date):
+    # Полуинтервал [start_date 00:00, end_date + 1 день 00:00) в TIME_ZONE проекта
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    return start, end
+
+def paid_tickets_between(range_start, range_end, model=Ticket):
+    # Сравнение с самим столбцом (а не purchase_time__date) позволяет искать по индексу.
+    # Value(True) дает явное is_paid = 1: голое "is_paid", которое Django пишет для SQLite,
+    # не совпадает с префиксом индекса (is_paid, purchase_time). model=ArchivedTicket - архив
+    return model.objects.filter(
+        is_paid=Value(True), purchase_time__gte=range_start, purchase_time__lt=range_end
+    )
 
 def generate_sales_report(start_date, end_date, report_type='daily'):
-    start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-    end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+    start_date = parse_report_date(start_date)
+    end_date = parse_report_date(end_date)
     
-    tickets = Ticket.objects.filter(
-        purchase_time__date__gte=start_date,
-        purchase_time__date__lte=end_date,
-        is_paid=True
-    )
+    # Дневные итоги ведутся в DailySales (см. rollups), стоимость отчета
+    # зависит от числа дней, а не от числа проданных билетов
+    sales = DailySales.objects.filter(day__gte=start_date, day__lte=end_date)
     
     if report_type == 'daily':
-        return generate_daily_report(tickets, start_date, end_date)
+        return generate_daily_report(sales, start_date, end_date)
     elif report_type == 'weekly':
-        return generate_weekly_report(tickets, start_date, end_date)
+        return generate_weekly_report(sales, start_date, end_date)
     elif report_type == 'monthly':
-        return generate_monthly_report(tickets, start_date, end_date)
+        return generate_monthly_report(sales, start_date, end_date)
     elif report_type == 'by_movie':
-        return generate_movie_report(tickets)
+        return generate_movie_report(sales)
     elif report_type == 'by_hall':
-        return generate_hall_report(tickets)
+        return generate_hall_report(sales)
     else:
         return []
 
-def generate_daily_report(tickets, start_date, end_date):
+def daily_totals(sales):
+    # Один GROUP BY по дням вместо запроса на каждый период
+    stats = sales.values('day').annotate(
+        total=Sum('revenue'),
+        count=Sum('tickets_count')
+    ).order_by()
+    
+    return {stat['day']: (stat['count'], stat['total']) for stat in stats}
+
+def sum_period(totals, period_start, period_end):
+    count, total = 0, 0
+    current_date = period_start
+    
+    while current_date <= period_end:
+        day_count, day_total = totals.get(current_date, (0, 0))
+        count += day_count
+        total += day_total or 0
+        current_date += timedelta(days=1)
+    
+    return count, round(total, 2)
+
+def generate_daily_report(sales, start_date, end_date):
     report_data = []
+    totals = daily_totals(sales)
     current_date = start_date
     
     while current_date <= end_date:
-        daily_tickets = tickets.filter(purchase_time__date=current_date)
-        total = daily_tickets.aggregate(total=Sum('price'), count=Count('id'))
+        count, total = sum_period(totals, current_date, current_date)
         
         report_data.append((
             current_date.strftime('%d.%m.%Y'),
-            total['count'] or 0,
-            round(total['total'] or 0, 2)
+            count,
+            total
         ))
         
         current_date += timedelta(days=1)
     
     return report_data
 
-def generate_weekly_report(tickets, start_date, end_date):
+def generate_weekly_report(sales, start_date, end_date):
     report_data = []
+    totals = daily_totals(sales)
     current_date = start_date
     
     while current_date <= end_date:
         week_start = current_date
         week_end = min(current_date + timedelta(days=6), end_date)
         
-        weekly_tickets = tickets.filter(
-            purchase_time__date__gte=week_start,
-            purchase_time__date__lte=week_end
-        )
-        
-        total = weekly_tickets.aggregate(total=Sum('price'), count=Count('id'))
+        count, total = sum_period(totals, week_start, week_end)
         
         report_data.append((
             f"{week_start.strftime('%d.%m')} - {week_end.strftime('%d.%m.%Y')}",
-            total['count'] or 0,
-            round(total['total'] or 0, 2)
+            count,
+            total
         ))
         
         current_date += timedelta(days=7)
     
     return report_data
 
-def generate_monthly_report(tickets, start_date, end_date):
+def generate_monthly_report(sales, start_date, end_date):
     report_data = []
+    totals = daily_totals(sales)
     current_date = start_date.replace(day=1)
     
     while current_date <= end_date:
         next_month = current_date.replace(day=28) + timedelta(days=4)
-        month_end = (next_month - timedelta(days=next_month.day)).replace(day=1)
+        month_end = next_month - timedelta(days=next_month.day)
         month_end = min(month_end, end_date)
         
-        monthly_tickets = tickets.filter(
-            purchase_time__date__gte=current_date,
-            purchase_time__date__lte=month_end
-        )
-        
-        total = monthly_tickets.aggregate(total=Sum('price'), count=Count('id'))
+        count, total = sum_period(totals, max(current_date, start_date), month_end)
         
         report_data.append((
             current_date.strftime('%B %Y'),
-            total['count'] or 0,
-            round(total['total'] or 0, 2)
+            count,
+            total
         ))
         
         current_date = month_end + timedelta(days=1)
     
     return report_data
 
-def generate_movie_report(tickets):
+def generate_movie_report(sales):
     report_data = []
     
-    movie_stats = tickets.values('session__movie__title').annotate(
-        total=Sum('price'),
-        count=Count('id')
-    ).order_by('-total')
+    movie_stats = sales.values('movie__title').annotate(
+        total=Sum('revenue'),
+        count=Sum('tickets_count')
+    ).filter(count__gt=0).order_by('-total')
     
     for stat in movie_stats:
         report_data.append((
-            stat['session__movie__title'],
+            stat['movie__title'],
             stat['count'],
             round(stat['total'], 2)
         ))
     
     return report_data
 
-def generate_hall_report(tickets):
+def generate_hall_report(sales):
     report_data = []
     
-    hall_stats = tickets.values('session__hall__name').annotate(
-        total=Sum('price'),
-        count=Count('id')
-    ).order_by('-total')
+    hall_stats = sales.values('hall__name').annotate(
+        total=Sum('revenue'),
+        count=Sum('tickets_count')
+    ).filter(count__gt=0).order_by('-total')
     
     for stat in hall_stats:
         report_data.append((
-            stat['session__hall__name'],
+            stat['hall__name'],
             stat['count'],
             round(stat['total'], 2)
         ))
     
-    return report_data
\ No newline at end of file
+    return report_data
+
+EXPORT_FIELDS = (
+    'id', 'purchase_time', 'session__movie__title', 'session__hall__name',
+    'session__start_time', 'row', 'seat', 'price', 'user__username'
+)
+
+def iter_paid_rows(tickets, chunk_size):
+    # Пачки выбираются по ключу (purchase_time, id) после последней строки: это
+    # диапазон по индексу (is_paid, purchase_time), память не растет и на MySQL,
+    # где драйвер читает результат запроса целиком
+    tickets = tickets.order_by('purchase_time', 'id').values_list(*EXPORT_FIELDS)
+    batch_filter = Q()
+    while True:
+        batch = list(tickets.filter(batch_filter)[:chunk_size].iterator(chunk_size=chunk_size))
+        yield from batch
+        
+        if len(batch) < chunk_size:
+            return
+        last_id, last_time = batch[-1][0], batch[-1][1]
+        batch_filter = Q(purchase_time__gt=last_time) | Q(purchase_time=last_time, id__gt=last_id)
+
+def iter_ticket_rows(start_date, end_date, chunk_size=2000, using=None):
+    # Построчная выгрузка оплаченных билетов без создания экземпляров моделей.
+    # Билеты и архив читаются отдельно и сливаются по (purchase_time, id):
+    # архивный билет сохраняет id исходного
+    start_date = parse_report_date(start_date)
+    end_date = parse_report_date(end_date)
+    range_start, range_end = local_day_range(start_date, end_date)
+    
+    rows = heapq.merge(
+        iter_paid_rows(paid_tickets_between(range_start, range_end).using(using), chunk_size),
+        iter_paid_rows(paid_tickets_between(range_start, range_end, ArchivedTicket).using(using), chunk_size),
+        key=lambda row: (row[1], row[0])
+    )
+    for ticket_id, purchase_time, title, hall, start_time, row, seat, price, username in rows:
+        yield (
+            ticket_id,
+            timezone.localtime(purchase_time).strftime('%d.%m.%Y %H:%M:%S'),
+            title,
+            hall,
+            timezone.localtime(start_time).strftime('%d.%m.%Y %H:%M'),
+            row,
+            seat,
+            price,
+            username
+        )
\ No newline at end of file
@@ -0,0 +1,140 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import ArchivedTicket, DailySales, Session, Ticket
+from .reports import local_day_range
+
+def purchase_day(purchase_time):
+    return timezone.localtime(purchase_time).date()
+
+def apply_delta(day, movie_id, hall_id, count, revenue):
+    if not count and not revenue:
+        return
+
+    rollup = DailySales.objects.filter(day=day, movie_id=movie_id, hall_id=hall_id)
+    changes = {
+        'tickets_count': F('tickets_count') + count,
+        'revenue': F('revenue') + revenue,
+    }
+
+    with transaction.atomic():
+        if rollup.update(**changes) or count < 0:
+            # Вычитать из несуществующей строки нечего: её удалили вместе с фильмом/залом
+            return
+        try:
+            with transaction.atomic():
+                DailySales.objects.create(
+                    day=day, movie_id=movie_id, hall_id=hall_id,
+                    tickets_count=count, revenue=revenue
+                )
+        except IntegrityError:
+            rollup.update(**changes)
+
+def ticket_state(ticket, movie_id, hall_id):
+    if not ticket.is_paid:
+        return None
+    return (purchase_day(ticket.purchase_time), movie_id, hall_id, ticket.price)
+
+def stored_ticket_state(values):
+    # values - строка билета из БД, см. signals.stored_ticket
+    if not values or not values['is_paid']:
+        return None
+    return (
+        purchase_day(values['purchase_time']),
+        values['session__movie_id'],
+        values['session__hall_id'],
+        values['price']
+    )
+
+def apply_state_change(old_state, new_state):
+    if old_state == new_state:
+        return
+    if old_state:
+        day, movie_id, hall_id, price = old_state
+        apply_delta(day, movie_id, hall_id, -1, -price)
+    if new_state:
+        day, movie_id, hall_id, price = new_state
+        apply_delta(day, movie_id, hall_id, 1, price)
+
+def session_keys(session_ids):
+    return {
+        pk: (movie_id, hall_id)
+        for pk, movie_id, hall_id in Session.objects.filter(pk__in=set(session_ids)).values_list(
+            'pk', 'movie_id', 'hall_id'
+        )
+    }
+
+def apply_tickets(tickets, sign=1):
+    # Для bulk_create/update/delete, которые не отправляют сигналы моделей
+    paid = [ticket for ticket in tickets if ticket.is_paid]
+    if not paid:
+        return
+
+    keys = session_keys(ticket.session_id for ticket in paid)
+    deltas = {}
+    for ticket in paid:
+        movie_id, hall_id = keys[ticket.session_id]
+        key = (purchase_day(ticket.purchase_time), movie_id, hall_id)
+        count, revenue = deltas.get(key, (0, 0))
+        deltas[key] = (count + sign, revenue + sign * ticket.price)
+
+    for (day, movie_id, hall_id), (count, revenue) in deltas.items():
+        apply_delta(day, movie_id, hall_id, count, revenue)
+
+def rollup_rows(tickets):
+    day = TruncDate('purchase_time', tzinfo=timezone.get_current_timezone())
+    stats = tickets.filter(is_paid=True).annotate(day=day).values(
+        'day', 'session__movie_id', 'session__hall_id'
+    ).annotate(
+        total=Sum('price'),
+        count=Count('id')
+    ).order_by()
+
+    for stat in stats.iterator():
+        yield DailySales(
+            day=stat['day'],
+            movie_id=stat['session__movie_id'],
+            hall_id=stat['session__hall_id'],
+            tickets_count=stat['count'],
+            revenue=stat['total']
+        )
+
+def apply_rows(tickets, sign=1):
+    # Для массовых UPDATE/DELETE: дельты считаются одним GROUP BY в БД, без загрузки билетов
+    for row in list(rollup_rows(tickets)):
+        apply_delta(row.day, row.movie_id, row.hall_id, sign * row.tickets_count, sign * row.revenue)
+
+def merged_rollup_rows(*querysets):
+    # Строки одного дня, фильма и зала могут быть и в Ticket, и в архиве
+    rows = {}
+    for tickets in querysets:
+        for row in rollup_rows(tickets):
+            key = (row.day, row.movie_id, row.hall_id)
+            if key in rows:
+                rows[key].tickets_count += row.tickets_count
+                rows[key].revenue += row.revenue
+            else:
+                rows[key] = row
+    return rows.values()
+
+@transaction.atomic
+def rebuild(start_date=None, end_date=None, batch_size=1000):
+    rollups = DailySales.objects.all()
+    tickets = Ticket.objects.all()
+    archived = ArchivedTicket.objects.all()
+
+    if start_date:
+        range_start, _ = local_day_range(start_date, start_date)
+        rollups = rollups.filter(day__gte=start_date)
+        tickets = tickets.filter(purchase_time__gte=range_start)
+        archived = archived.filter(purchase_time__gte=range_start)
+    if end_date:
+        _, range_end = local_day_range(end_date, end_date)
+        rollups = rollups.filter(day__lte=end_date)
+        tickets = tickets.filter(purchase_time__lt=range_end)
+        archived = archived.filter(purchase_time__lt=range_end)
+
+    rollups.delete()
+    rows = merged_rollup_rows(tickets, archived)
+    return len(DailySales.objects.bulk_create(rows, batch_size=batch_size))
\ No newline at end of file
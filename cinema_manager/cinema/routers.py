@@ -0,0 +1,76 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Псевдоним БД для чтения в текущем запросе; None - основная база
+_read_alias = ContextVar('cinema_read_alias', default=None)
+# Внутри primary_reads() реплика не используется даже под @replica_reads
+_primary_only = ContextVar('cinema_primary_only', default=False)
+
+PIN_COOKIE = 'cinema_primary_until'
+
+def replica_alias():
+    alias = getattr(settings, 'CINEMA_READ_REPLICA', None)
+    return alias if alias in settings.DATABASES else None
+
+def current_read_alias():
+    return _read_alias.get() or DEFAULT_DB_ALIAS
+
+def is_pinned(request):
+    # После покупки чтения пользователя идут в основную базу, пока реплика не догонит
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def pin_to_primary(response):
+    seconds = getattr(settings, 'CINEMA_REPLICA_PIN_SECONDS', 30)
+    response.set_cookie(PIN_COOKIE, str(int(time.time()) + seconds), max_age=seconds, samesite='Lax')
+    return response
+
+@contextmanager
+def read_from_replica(request):
+    alias = replica_alias()
+    if alias is None or is_pinned(request) or _primary_only.get():
+        yield
+        return
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+@contextmanager
+def primary_reads():
+    # Для данных, которые кэшируются для всех посетителей (cinema.pagecache):
+    # страница из отстающей реплики осталась бы в кэше до следующего изменения
+    token = _primary_only.set(True)
+    try:
+        yield
+    finally:
+        _primary_only.reset(token)
+
+def replica_reads(view):
+    # Для представлений, которые только читают: запросы идут в реплику.
+    # Ленивые итераторы, которые дочитываются после возврата ответа, должны брать
+    # базу явно через current_read_alias()
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with read_from_replica(request):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+class ReplicaRouter:
+    # Запись всегда в основную базу; чтение - в реплику только внутри read_from_replica
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+    
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+    
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, связи между базами допустимы
+        return True
\ No newline at end of file
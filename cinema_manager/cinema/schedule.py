@@ -0,0 +1,82 @@
+import time
+from collections import namedtuple
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+from .models import Session
+
+CACHE_TIMEOUT = 60 * 60
+CACHE_KEY = 'cinema:schedule'
+GENERATION_KEY = 'cinema:schedule:generation'
+# Сколько ближайших сеансов показывает главная
+HOME_SESSIONS = 10
+
+# Строка афиши: сеанс вместе с нужными шаблонам полями фильма и зала
+ScheduleEntry = namedtuple('ScheduleEntry', [
+    'id', 'start_time', 'end_time', 'base_price',
+    'movie_id', 'movie_title', 'poster',
+    'hall_id', 'hall_name',
+])
+
+def build_schedule(now=None, movie_id=None, limit=None):
+    # Предстоящие сеансы (фильма, первые limit) одним запросом с JOIN фильма и зала.
+    # Афиша общая для всех процессов, поэтому собирается из основной базы, а не из
+    # отстающей реплики: иначе устаревшая версия закэшировалась бы до следующего изменения
+    rows = Session.objects.using(DEFAULT_DB_ALIAS).filter(start_time__gte=now or timezone.now())
+    if movie_id is not None:
+        rows = rows.filter(movie_id=movie_id)
+    rows = rows.order_by('start_time', 'id').values_list(
+        'id', 'start_time', 'end_time', 'base_price',
+        'movie_id', 'movie__title', 'movie__poster',
+        'hall_id', 'hall__name',
+    )
+    if limit is not None:
+        rows = rows[:limit]
+    return [
+        ScheduleEntry(pk, start, end, price, movie_id, title, poster, hall_id, hall_name)
+        for pk, start, end, price, movie_id, title, poster, hall_id, hall_name in rows
+    ]
+
+def get_generation():
+    cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+    return cache.get(GENERATION_KEY)
+
+def cached_entries(key, now, movie_id=None, limit=None):
+    # Каждая запись кэша ограничена: ближайшие limit сеансов или сеансы одного фильма,
+    # так что ни размер записи, ни работа на запрос не растут вместе со всей афишей
+    generation = get_generation()
+    cached = cache.get(key)
+    if cached is not None and cached[0] == generation:
+        entries = cached[1]
+        # Сеансы отсортированы, начавшиеся после сборки идут первыми и отбрасываются при чтении
+        started = next((i for i, entry in enumerate(entries) if entry.start_time >= now), len(entries))
+        # Из полного среза ушли начавшиеся сеансы: следующих за ним в записи нет, нужна пересборка
+        if not started or limit is None or len(entries) < limit:
+            return entries[started:]
+    entries = build_schedule(now, movie_id, limit)
+    cache.set(key, (generation, entries), CACHE_TIMEOUT)
+    return entries
+
+def home_sessions(now=None):
+    return cached_entries(f'{CACHE_KEY}:home', now or timezone.now(), limit=HOME_SESSIONS)
+
+def movie_sessions(movie_id, now=None):
+    return cached_entries(f'{CACHE_KEY}:movie:{movie_id}', now or timezone.now(), movie_id=movie_id)
+
+def next_start(movie_id=None, now=None):
+    # Когда ближайший сеанс (фильма) начнется и пропадет из афиши; None - сеансов нет
+    entries = home_sessions(now) if movie_id is None else movie_sessions(movie_id, now)
+    return entries[0].start_time if entries else None
+
+def invalidate():
+    # Собранная до изменения афиша перестает совпадать по поколению.
+    # У файлового бэкенда incr - это get + set, и два одновременных увеличения
+    # дают одно; это безопасно: оба увеличения идут после коммитов, поэтому любая
+    # страница с новым поколением собрана уже после обоих изменений
+    def bump():
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+
+    transaction.on_commit(bump)
\ No newline at end of file
@@ -0,0 +1,153 @@
+import csv
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import accumulate
+from django.db import transaction
+from django.utils import timezone
+from .models import Hall, Movie, Session
+from . import schedule
+
+COLUMNS = ('movie', 'hall', 'start_time', 'base_price')
+
+# created - созданные сеансы, conflicts - пересечения по времени, errors - ошибки в строках
+ImportResult = namedtuple('ImportResult', ['created', 'conflicts', 'errors'])
+
+# Строка файла, прошедшая разбор; line - номер строки для отчета
+Candidate = namedtuple('Candidate', ['line', 'movie', 'hall', 'start_time', 'end_time', 'base_price'])
+
+def lookup_table(objects, label):
+    # Поиск по id и по названию; одинаковые названия помечаются как неоднозначные
+    table = {}
+    for obj in objects:
+        table[str(obj.pk)] = obj
+        key = getattr(obj, label).strip().lower()
+        table[key] = None if key in table else obj
+    return table
+
+def parse_start_time(value):
+    start_time = datetime.fromisoformat(value.strip())
+    if timezone.is_naive(start_time):
+        start_time = timezone.make_aware(start_time)
+    return start_time
+
+def parse_rows(rows):
+    movies = lookup_table(Movie.objects.all(), 'title')
+    halls = lookup_table(Hall.objects.all(), 'name')
+    candidates, errors = [], []
+
+    for line, row in rows:
+        movie = movies.get((row.get('movie') or '').strip().lower())
+        hall = halls.get((row.get('hall') or '').strip().lower())
+        if movie is None:
+            errors.append({'line': line, 'error': f'Фильм не найден или неоднозначен: {row.get("movie")}'})
+            continue
+        if hall is None:
+            errors.append({'line': line, 'error': f'Зал не найден или неоднозначен: {row.get("hall")}'})
+            continue
+        try:
+            start_time = parse_start_time(row.get('start_time') or '')
+        except ValueError:
+            errors.append({'line': line, 'error': f'Неверное время начала: {row.get("start_time")}'})
+            continue
+        try:
+            base_price = Decimal((row.get('base_price') or '').strip())
+        except InvalidOperation:
+            errors.append({'line': line, 'error': f'Неверная цена: {row.get("base_price")}'})
+            continue
+        if base_price <= 0:
+            errors.append({'line': line, 'error': f'Неверная цена: {row.get("base_price")}'})
+            continue
+
+        end_time = start_time + timedelta(minutes=movie.duration)
+        candidates.append(Candidate(line, movie, hall, start_time, end_time, base_price))
+
+    return candidates, errors
+
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+    missing = [column for column in COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f'В файле нет столбцов: {", ".join(missing)}')
+    # Строка 1 - заголовок
+    return [(line, row) for line, row in enumerate(reader, start=2)]
+
+def existing_intervals(hall_ids, start, end):
+    # Сеансы выбранных залов, задевающие период импорта, по (hall, start_time) одним запросом
+    intervals = {}
+    sessions = Session.objects.filter(
+        hall_id__in=hall_ids, start_time__lt=end, end_time__gt=start
+    ).order_by('start_time').values_list('hall_id', 'start_time', 'end_time', 'pk')
+    for hall_id, start_time, end_time, pk in sessions:
+        intervals.setdefault(hall_id, []).append((start_time, end_time, pk))
+    return intervals
+
+def find_conflicts(candidates, intervals):
+    # Для каждого зала: сначала сверка с существующими сеансами двоичным поиском по
+    # отсортированным началам и префиксному максимуму концов, затем проход по новым
+    # строкам в порядке начала - строка принимается, если начинается не раньше конца
+    # последней принятой. Итого O(n log n) вместо попарных запросов
+    accepted, conflicts = [], []
+    by_hall = {}
+    for candidate in candidates:
+        by_hall.setdefault(candidate.hall.pk, []).append(candidate)
+
+    for hall_id, hall_candidates in by_hall.items():
+        existing = intervals.get(hall_id, [])
+        starts = [start for start, _, _ in existing]
+        max_ends = list(accumulate(existing, lambda best, item: max(best, item, key=lambda i: i[1])))
+
+        last = None
+        for candidate in sorted(hall_candidates, key=lambda c: (c.start_time, c.line)):
+            i = bisect_left(starts, candidate.end_time)
+            if i and max_ends[i - 1][1] > candidate.start_time:
+                conflicts.append({
+                    'line': candidate.line,
+                    'hall': candidate.hall.name,
+                    'start_time': candidate.start_time.isoformat(),
+                    'conflicts_with': f'сеанс #{max_ends[i - 1][2]}',
+                })
+            elif last is not None and candidate.start_time < last.end_time:
+                conflicts.append({
+                    'line': candidate.line,
+                    'hall': candidate.hall.name,
+                    'start_time': candidate.start_time.isoformat(),
+                    'conflicts_with': f'строка {last.line}',
+                })
+            else:
+                accepted.append(candidate)
+                last = candidate
+
+    return accepted, conflicts
+
+def import_schedule(lines, dry_run=False):
+    candidates, errors = parse_rows(read_csv(lines))
+    if not candidates:
+        return ImportResult([], [], errors)
+
+    hall_ids = sorted({candidate.hall.pk for candidate in candidates})
+    with transaction.atomic():
+        # Блокировка залов: параллельный импорт или SessionForm для тех же залов
+        # дождется конца транзакции и увидит вставленные сеансы
+        list(Hall.objects.select_for_update().filter(pk__in=hall_ids).values_list('pk'))
+        intervals = existing_intervals(
+            hall_ids,
+            min(candidate.start_time for candidate in candidates),
+            max(candidate.end_time for candidate in candidates)
+        )
+        accepted, conflicts = find_conflicts(candidates, intervals)
+
+        sessions = [
+            Session(
+                movie=candidate.movie, hall=candidate.hall, start_time=candidate.start_time,
+                end_time=candidate.end_time, base_price=candidate.base_price
+            )
+            for candidate in sorted(accepted, key=lambda c: c.line)
+        ]
+        if sessions and not dry_run:
+            Session.objects.bulk_create(sessions, batch_size=1000)
+            # bulk_create не отправляет сигналы
+            schedule.invalidate()
+
+    return ImportResult(sessions, sorted(conflicts, key=lambda c: c['line']), errors)
\ No newline at end of file
@@ -0,0 +1,43 @@
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+from . import occupancy
+
+# Класс места по биту занятости
+SEAT_STATE = ('available', 'booked')
+
+def fragment_key(session_id):
+    return f'cinema:seatmap:{session_id}:html'
+
+def render(seat_map):
+    # Разметка схемы зала одной строкой вместо вложенных циклов шаблона.
+    # Номер ряда хранится на строке ряда, клики обрабатываются делегированием в шаблоне
+    parts = []
+    seats = seat_map.iter_seats()
+    for row in range(1, seat_map.rows + 1):
+        parts.append(
+            f'<div class="seat-row d-flex justify-content-center mb-2" data-row="{row}">'
+            f'<div class="row-label me-2">Ряд {row}</div><div class="seats d-flex">'
+        )
+        for _ in range(seat_map.seats_per_row):
+            _, seat, booked = next(seats)
+            parts.append(
+                f'<div class="seat {SEAT_STATE[booked]}" title="Ряд {row}, Место {seat}" '
+                f'data-seat="{seat}">{seat}</div>'
+            )
+        parts.append('</div></div>')
+    return ''.join(parts)
+
+def get_html(session):
+    # Фрагмент хранится вместе с версией занятости, как схема в occupancy:
+    # версия, фрагмент и срок удержаний читаются одним get_many, и после любого
+    # изменения мест (record_changes, invalidate) старый фрагмент считается промахом
+    keys = [fragment_key(session.pk), occupancy.version_key(session.pk), occupancy.expiry_key(session.pk)]
+    cached = cache.get_many(keys)
+    version = occupancy.read_version(session.pk, cached)
+    entry = cached.get(keys[0])
+    if entry is not None and entry[0] == version:
+        return mark_safe(entry[1])
+    
+    html = render(occupancy.get_seat_map(session))
+    cache.set(keys[0], (version, html), occupancy.CACHE_TIMEOUT)
+    return mark_safe(html)
@@ -0,0 +1,85 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from .models import ArchivedTicket, Discount, Hall, Movie, Session, Ticket
+from . import discounts, occupancy, posters, rollups, schedule
+
+STORED_FIELDS = (
+    'session_id', 'row', 'seat', 'is_paid', 'price', 'purchase_time',
+    'session__movie_id', 'session__hall_id',
+)
+
+def stored_ticket(ticket_id, model=Ticket):
+    return model.objects.filter(pk=ticket_id).values(*STORED_FIELDS).first()
+
+@receiver(pre_save, sender=Ticket)
+def remember_ticket_state(sender, instance, raw=False, **kwargs):
+    instance._stored = None
+    if not raw and instance.pk and not instance._state.adding:
+        instance._stored = stored_ticket(instance.pk)
+
+@receiver(post_save, sender=Ticket)
+def update_sales_rollup(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    session = instance.session
+    new_state = rollups.ticket_state(instance, session.movie_id, session.hall_id)
+    old_state = rollups.stored_ticket_state(getattr(instance, '_stored', None))
+    rollups.apply_state_change(old_state, new_state)
+
+@receiver(post_save, sender=Ticket)
+def update_seat_map(sender, instance, raw=False, **kwargs):
+    if raw:
+        occupancy.invalidate(instance.session_id)
+        return
+    
+    stored = getattr(instance, '_stored', None)
+    seat = (instance.row, instance.seat)
+    if stored is None:
+        occupancy.record_changes(instance.session_id, booked=[seat])
+    elif (stored['session_id'], stored['row'], stored['seat']) != (instance.session_id,) + seat:
+        occupancy.record_changes(stored['session_id'], released=[(stored['row'], stored['seat'])])
+        occupancy.record_changes(instance.session_id, booked=[seat])
+
+# Архивный билет удаляется только каскадом вместе с сеансом или пользователем,
+# и его продажа тоже уходит из DailySales
+@receiver(pre_delete, sender=Ticket)
+@receiver(pre_delete, sender=ArchivedTicket)
+def remember_deleted_ticket_state(sender, instance, **kwargs):
+    instance._stored = stored_ticket(instance.pk, sender)
+
+@receiver(post_delete, sender=Ticket)
+@receiver(post_delete, sender=ArchivedTicket)
+def remove_from_sales_rollup(sender, instance, **kwargs):
+    rollups.apply_state_change(rollups.stored_ticket_state(getattr(instance, '_stored', None)), None)
+
+@receiver(post_delete, sender=Ticket)
+def release_seat(sender, instance, **kwargs):
+    occupancy.record_changes(instance.session_id, released=[(instance.row, instance.seat)])
+
+@receiver(post_delete, sender=Session)
+def forget_seat_map(sender, instance, **kwargs):
+    occupancy.forget(instance.pk)
+
+@receiver(post_save, sender=Hall)
+def invalidate_hall_seat_maps(sender, instance, raw=False, **kwargs):
+    if not raw:
+        occupancy.invalidate_hall(instance.pk)
+
+@receiver(post_save, sender=Session)
+@receiver(post_delete, sender=Session)
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+@receiver(post_save, sender=Hall)
+@receiver(post_delete, sender=Hall)
+def invalidate_schedule(sender, **kwargs):
+    schedule.invalidate()
+
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+def invalidate_discounts(sender, **kwargs):
+    discounts.invalidate()
+
+@receiver(post_save, sender=Movie)
+def generate_poster_variants(sender, instance, raw=False, **kwargs):
+    if not raw and instance.poster:
+        posters.schedule_after_commit(instance.poster.name)
\ No newline at end of file
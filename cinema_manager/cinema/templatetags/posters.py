@@ -0,0 +1,9 @@
+from django import template
+from cinema import posters
+
+register = template.Library()
+
+@register.simple_tag
+def poster_url(poster, variant='card'):
+    # {% poster_url movie.poster 'detail' %}; poster - поле ImageField или имя файла
+    return posters.poster_url(poster, variant)
\ No newline at end of file
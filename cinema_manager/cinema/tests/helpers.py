@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.utils import timezone
+from cinema.discounts import discount_cache
+from cinema.models import Hall, Movie, Session, Ticket, User
+
+def reset_caches():
+    # Версии схем, поколение афиши и страницы живут в кэше и переживают откат транзакции теста
+    cache.clear()
+    discount_cache.clear()
+
+def create_movie(title='Фильм', duration=120, using='default'):
+    # Без постера: тестам не нужна фоновая генерация вариантов
+    return Movie.objects.using(using).create(
+        title=title, description='Описание', duration=duration, poster='', age_rating=12,
+        genre='Драма', director='Режиссер', release_date=date(2020, 1, 1)
+    )
+
+def create_hall(name='Зал 1', rows=10, seats_per_row=20):
+    return Hall.objects.create(name=name, seats_rows=rows, seats_per_row=seats_per_row)
+
+def create_sessions(count, movies, halls, start=None, step=timedelta(hours=3)):
+    # count сеансов подряд через step, фильмы и залы по кругу
+    start = start or timezone.now() + timedelta(hours=1)
+    sessions = []
+    for i in range(count):
+        movie = movies[i % len(movies)]
+        start_time = start + step * i
+        sessions.append(Session(
+            movie=movie, hall=halls[i % len(halls)], start_time=start_time,
+            end_time=start_time + timedelta(minutes=movie.duration), base_price=Decimal('300.00')
+        ))
+    return Session.objects.bulk_create(sessions)
+
+def create_tickets(sessions, per_session, user, is_paid=True, purchase_time=None):
+    # Места ряд за рядом; bulk_create не трогает сводку и схемы залов
+    tickets = []
+    for session in sessions:
+        for i in range(per_session):
+            row, seat = divmod(i, session.hall.seats_per_row)
+            tickets.append(Ticket(
+                session=session, user=user, row=row + 1, seat=seat + 1,
+                price=Decimal('300.00'), is_paid=is_paid
+            ))
+    tickets = Ticket.objects.bulk_create(tickets)
+    if purchase_time is not None:
+        Ticket.objects.filter(pk__in=[ticket.pk for ticket in tickets]).update(purchase_time=purchase_time)
+    return tickets
+
+def create_user(username='buyer', **fields):
+    return User.objects.create_user(username, password='password', **fields)
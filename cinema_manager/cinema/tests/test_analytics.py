@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from django.test import TestCase
+from django.utils import timezone
+from cinema import analytics
+from cinema.models import ArchivedTicket, Ticket
+from .helpers import create_hall, create_movie, create_sessions, create_tickets, create_user
+
+class AnalyticsReportTests(TestCase):
+    # Зал 2x2, два сеанса в понедельник 2 марта 2026 по местному времени:
+    # на 10:00 проданы три места за два дня до начала, на 19:00 - одно за час
+    @classmethod
+    def setUpTestData(cls):
+        movie = create_movie('Фильм')
+        hall = create_hall('Зал', rows=2, seats_per_row=2)
+        user = create_user()
+        morning = timezone.make_aware(datetime(2026, 3, 2, 10, 0))
+        evening = timezone.make_aware(datetime(2026, 3, 2, 19, 0))
+        cls.morning = create_sessions(1, [movie], [hall], start=morning)[0]
+        cls.evening = create_sessions(1, [movie], [hall], start=evening)[0]
+        create_tickets([cls.morning], 3, user, purchase_time=morning - timedelta(days=2, hours=1))
+        create_tickets([cls.evening], 1, user, purchase_time=evening - timedelta(hours=1))
+        # Перенесенный в архив билет учитывается наравне с обычными
+        ticket = Ticket.objects.get(session=cls.evening)
+        ArchivedTicket.objects.create(
+            id=ticket.id, session=cls.evening, user=user, row=ticket.row, seat=ticket.seat,
+            price=ticket.price, purchase_time=ticket.purchase_time, is_paid=True, archived_at=timezone.now()
+        )
+        ticket.delete()
+    
+    def report(self, report_type):
+        return analytics.generate_report('2026-03-02', '2026-03-02', report_type)
+    
+    def test_fill_rate(self):
+        header, rows = self.report('fill_rate')
+        self.assertEqual(len(header), 6)
+        self.assertEqual(rows, [
+            ('02.03.2026 10:00', 'Фильм', 'Зал', 3, 4, 75.0),
+            ('02.03.2026 19:00', 'Фильм', 'Зал', 1, 4, 25.0),
+        ])
+    
+    def test_demand(self):
+        _, rows = self.report('demand')
+        self.assertEqual(rows, [('Пн', '10:00', 1, 3, 75.0), ('Пн', '19:00', 1, 1, 25.0)])
+    
+    def test_sell_through(self):
+        _, rows = self.report('sell_through')
+        self.assertEqual(len(rows), analytics.MAX_LEAD_DAYS + 1)
+        self.assertEqual(rows[-3:], [('Фильм', '2', 3, 75.0), ('Фильм', '1', 0, 75.0), ('Фильм', '0', 1, 100.0)])
+    
+    def test_seat_popularity(self):
+        _, rows = self.report('seat_popularity')
+        self.assertEqual(rows, [
+            ('Зал', 1, 1, 2, 100.0),
+            ('Зал', 1, 2, 1, 50.0),
+            ('Зал', 2, 1, 1, 50.0),
+            ('Зал', 2, 2, 0, 0.0),
+        ])
+    
+    def test_period_without_sessions(self):
+        for report_type in analytics.REPORT_TYPES:
+            with self.subTest(report_type=report_type):
+                _, rows = analytics.generate_report('2026-04-01', '2026-04-02', report_type)
+                self.assertEqual(rows, [])
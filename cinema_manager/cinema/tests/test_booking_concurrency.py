@@ -0,0 +1,76 @@
+import json
+import threading
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from cinema.models import Ticket
+from .helpers import create_hall, create_movie, create_sessions, create_user, reset_caches
+
+class ConcurrentBookingTests(TransactionTestCase):
+    # Покупатели одновременно бронируют одни и те же места настоящими запросами
+    # в отдельных потоках: каждый поток со своим соединением, без общей транзакции теста
+    BUYERS = 8
+    
+    def setUp(self):
+        reset_caches()
+        self.session = create_sessions(1, [create_movie()], [create_hall()])[0]
+        self.users = [create_user(f'buyer{i}') for i in range(self.BUYERS)]
+        self.url = reverse('cinema:book_seats', args=[self.session.pk])
+    
+    def book_concurrently(self, seats_for):
+        # seats_for(i) - места, которые берет i-й покупатель; возвращает ответы по порядку
+        barrier = threading.Barrier(self.BUYERS)
+        responses = [None] * self.BUYERS
+        
+        def buy(i):
+            try:
+                # 500 приходит ответом, а не исключением в потоке
+                client = Client(raise_request_exception=False)
+                client.force_login(self.users[i])
+                barrier.wait()
+                responses[i] = client.post(
+                    self.url, json.dumps({'seats': seats_for(i)}), content_type='application/json'
+                )
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=buy, args=(i,)) for i in range(self.BUYERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+    
+    def assert_no_double_sale(self, responses):
+        self.assertTrue(all(response is not None for response in responses))
+        self.assertEqual(
+            [response.status_code for response in responses if response.status_code not in (201, 409)], []
+        )
+        duplicates = Ticket.objects.values('session', 'row', 'seat').annotate(sold=Count('id')).filter(sold__gt=1)
+        self.assertEqual(list(duplicates), [])
+        # Каждый проданный билет подтвержден ровно одному покупателю
+        sold = sorted(Ticket.objects.values_list('user__username', 'row', 'seat'))
+        confirmed = sorted(
+            (self.users[i].username, ticket['row'], ticket['seat'])
+            for i, response in enumerate(responses) if response.status_code == 201
+            for ticket in response.json()['tickets']
+        )
+        self.assertEqual(sold, confirmed)
+    
+    def test_same_seats(self):
+        responses = self.book_concurrently(lambda i: [[1, 1], [1, 2]])
+        self.assert_no_double_sale(responses)
+        self.assertEqual(sorted(response.status_code for response in responses), [201] + [409] * (self.BUYERS - 1))
+    
+    def test_overlapping_seats(self):
+        # Соседние покупатели спорят за одно место: (1, i) и (1, i + 1)
+        responses = self.book_concurrently(lambda i: [[1, i + 1], [1, i + 2]])
+        self.assert_no_double_sale(responses)
+        self.assertTrue(any(response.status_code == 201 for response in responses))
+    
+    @override_settings(CINEMA_BOOKING_QUEUE=True)
+    def test_same_seats_through_queue(self):
+        responses = self.book_concurrently(lambda i: [[1, 1], [1, 2]])
+        self.assert_no_double_sale(responses)
+        self.assertEqual(sorted(response.status_code for response in responses), [201] + [409] * (self.BUYERS - 1))
@@ -0,0 +1,103 @@
+import threading
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from cinema import booking_queue, holds, occupancy
+from cinema.booking_queue import BookingRequest
+from cinema.models import SeatHold, Ticket
+from .helpers import create_hall, create_movie, create_sessions, create_user, reset_caches
+
+@override_settings(CINEMA_BOOKING_QUEUE=True)
+class BookingBatchTests(TestCase):
+    # Пачка записывается в потоке теста через process(), как ее записал бы поток очереди:
+    # порядок заявок в пачке задан явно
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = create_sessions(1, [create_movie()], [create_hall()])[0]
+        cls.users = [create_user(f'buyer{i}') for i in range(3)]
+    
+    def setUp(self):
+        reset_caches()
+    
+    def process(self, *requests):
+        batch = [BookingRequest(self.session, user, seats, None) for user, seats in requests]
+        with self.captureOnCommitCallbacks(execute=True):
+            return booking_queue.get_queue().process(batch)
+    
+    def sold(self):
+        return sorted(Ticket.objects.filter(session=self.session).values_list('user__username', 'row', 'seat'))
+    
+    def test_first_request_in_batch_wins(self):
+        first, second, third = self.process(
+            (self.users[0], [(1, 1), (1, 2)]),
+            (self.users[1], [(1, 2), (1, 3)]),
+            (self.users[2], [(1, 3)]),
+        )
+        self.assertEqual(len(first.created), 2)
+        self.assertEqual(second.conflicts, [(1, 2)])
+        # Проигравшая заявка мест не занимает: (1, 3) достается следующей
+        self.assertEqual(len(third.created), 1)
+        self.assertEqual(self.sold(), [('buyer0', 1, 1), ('buyer0', 1, 2), ('buyer2', 1, 3)])
+        self.assertTrue(occupancy.get_seat_map(self.session).is_booked(1, 3))
+    
+    def test_holds_of_others_block_and_own_holds_do_not(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            holds.create_holds(self.session, self.users[0], [(2, 1)])
+        other, own = self.process(
+            (self.users[1], [(2, 1)]),
+            (self.users[0], [(2, 1)]),
+        )
+        self.assertEqual(other.conflicts, [(2, 1)])
+        self.assertEqual(len(own.created), 1)
+        self.assertFalse(SeatHold.objects.filter(session=self.session).exists())
+        self.assertEqual(self.sold(), [('buyer0', 2, 1)])
+    
+    def test_stale_seat_map_replays_batch_through_unique_index(self):
+        # Место продано в обход очереди и кэша: схема в кэше его не видит
+        occupancy.get_seat_map(self.session)
+        Ticket.objects.bulk_create([
+            Ticket(session=self.session, user=self.users[2], row=3, seat=1, price=self.session.base_price)
+        ])
+        stale, fresh = self.process(
+            (self.users[0], [(3, 1)]),
+            (self.users[1], [(3, 2)]),
+        )
+        # Пачка откатилась целиком и повторена по одной заявке через booking.book_seats
+        self.assertEqual(stale.conflicts, [(3, 1)])
+        self.assertEqual(len(fresh.created), 1)
+        self.assertEqual(self.sold(), [('buyer1', 3, 2), ('buyer2', 3, 1)])
+
+@override_settings(CINEMA_BOOKING_QUEUE=True)
+class BookingQueueThreadTests(TransactionTestCase):
+    # Покупки через настоящий поток записи: он работает со своим соединением,
+    # поэтому данные теста должны быть закоммичены
+    BUYERS = 8
+    
+    def setUp(self):
+        reset_caches()
+        self.session = create_sessions(1, [create_movie()], [create_hall()])[0]
+        self.users = [create_user(f'buyer{i}') for i in range(self.BUYERS)]
+    
+    def test_concurrent_buyers_of_one_seat(self):
+        barrier = threading.Barrier(self.BUYERS)
+        results = [None] * self.BUYERS
+        
+        def buy(i):
+            try:
+                barrier.wait()
+                results[i] = booking_queue.book_seats(self.session, self.users[i], [(5, 5)])
+            finally:
+                # Соединение понадобится, только если заявка уйдет в обход очереди
+                connection.close()
+        
+        threads = [threading.Thread(target=buy, args=(i,)) for i in range(self.BUYERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        winners = [i for i, result in enumerate(results) if result.created]
+        self.assertEqual(len(winners), 1)
+        self.assertTrue(all(result.conflicts == [(5, 5)] for result in results if not result.created))
+        self.assertEqual(
+            list(Ticket.objects.values_list('user__username', 'row', 'seat')), [(f'buyer{winners[0]}', 5, 5)]
+        )
@@ -0,0 +1,61 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from cinema import booking, holds, occupancy
+from cinema.models import SeatHold, Ticket
+from .helpers import create_hall, create_movie, create_sessions, create_user, reset_caches
+
+class ExpiredHoldTests(TestCase):
+    # Истекшее удержание проданного места не должно публиковаться как освобождение:
+    # клиенты SSE и ?since= показали бы проданное место свободным
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = create_sessions(1, [create_movie()], [create_hall()])[0]
+        cls.holder = create_user('holder')
+        cls.buyer = create_user('buyer')
+    
+    def setUp(self):
+        reset_caches()
+    
+    def expire(self, user):
+        SeatHold.objects.filter(session=self.session, user=user).update(expires_at=timezone.now() - timedelta(seconds=1))
+    
+    def changes(self, action):
+        # Изменения схемы зала, опубликованные после коммита action()
+        since = occupancy.get_version(self.session.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            action()
+        return occupancy.changes_since(self.session.pk, since, occupancy.get_version(self.session.pk))
+    
+    def test_booking_removes_expired_holds_of_others(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            holds.create_holds(self.session, self.holder, [(1, 1)])
+        self.expire(self.holder)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            result = booking.book_seats(self.session, self.buyer, [(1, 1)])
+        self.assertEqual(len(result.created), 1)
+        self.assertFalse(SeatHold.objects.filter(session=self.session).exists())
+        
+        self.assertEqual(self.changes(holds.purge_expired), ([], []))
+    
+    def test_purge_skips_sold_seats(self):
+        # Удержание, созданное одновременно с покупкой, переживает ее
+        SeatHold.objects.create(
+            session=self.session, user=self.holder, row=1, seat=1, expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        SeatHold.objects.create(
+            session=self.session, user=self.holder, row=1, seat=2, expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        Ticket.objects.create(session=self.session, user=self.buyer, row=1, seat=1, price=self.session.base_price)
+        
+        self.assertEqual(self.changes(holds.purge_expired), ([], [(1, 2)]))
+        self.assertFalse(SeatHold.objects.exists())
+    
+    def test_release_skips_sold_seats(self):
+        SeatHold.objects.create(
+            session=self.session, user=self.holder, row=1, seat=1, expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        Ticket.objects.create(session=self.session, user=self.buyer, row=1, seat=1, price=self.session.base_price)
+        
+        self.assertEqual(self.changes(lambda: holds.release_holds(self.session, self.holder)), ([], []))
@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache.backends.filebased import FileBasedCache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from cinema import pagecache, schedule
+from .helpers import create_hall, create_movie, create_sessions, create_user, reset_caches
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = create_movie('Премьера')
+        cls.session = create_sessions(1, [cls.movie], [create_hall()])[0]
+    
+    def setUp(self):
+        reset_caches()
+        self.url = reverse('cinema:home')
+    
+    def test_repeated_request_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.content, first.content)
+    
+    def test_conditional_requests_get_304(self):
+        response = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            self.assertEqual(
+                self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+            )
+    
+    def test_movie_change_invalidates_page(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.title = 'Новое название'
+            self.movie.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новое название')
+    
+    def test_new_session_invalidates_movie_page(self):
+        url = reverse('cinema:movie_detail', args=[self.movie.pk])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            create_sessions(1, [self.movie], [self.session.hall], start=self.session.end_time + timedelta(hours=1))
+            # bulk_create не отправляет сигналы
+            self.session.save()
+        response = self.client.get(url)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.context['sessions']), 2)
+    
+    def test_authenticated_users_bypass_cache(self):
+        self.client.get(self.url)
+        self.client.force_login(create_user())
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('ETag'))
+
+class SingleFlightTests(SimpleTestCase):
+    # Пересборку истекшей страницы выполняет один запрос, остальные ждут ее результат
+    REQUESTS = 8
+    
+    def setUp(self):
+        reset_caches()
+    
+    def file_cache(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        return override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        })
+    
+    def rebuild_concurrently(self):
+        calls = []
+        
+        @pagecache.cache_anonymous_page(lambda: None)
+        def slow_view(request):
+            calls.append(1)
+            time.sleep(0.2)
+            return HttpResponse('страница')
+        
+        barrier = threading.Barrier(self.REQUESTS)
+        responses = []
+        
+        def get():
+            request = RequestFactory().get('/')
+            request.user = AnonymousUser()
+            barrier.wait()
+            responses.append(slow_view(request))
+        
+        threads = [threading.Thread(target=get) for _ in range(self.REQUESTS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return calls, responses
+    
+    def assert_single_rebuild(self):
+        # Всплеск запросов к истекшей странице: поколение афиши уже заведено
+        schedule.get_generation()
+        calls, responses = self.rebuild_concurrently()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([response.content.decode() for response in responses], ['страница'] * self.REQUESTS)
+    
+    def test_single_rebuild_with_local_memory_cache(self):
+        self.assert_single_rebuild()
+    
+    def test_single_rebuild_with_file_cache(self):
+        # cache.add файлового бэкенда - это has_key + set; пауза между ними делает гонку
+        # неизбежной, поэтому тест проходит только с блокировкой через файл с O_EXCL
+        has_key = FileBasedCache.has_key
+        
+        def slow_has_key(cache, *args, **kwargs):
+            found = has_key(cache, *args, **kwargs)
+            time.sleep(0.05)
+            return found
+        
+        with self.file_cache(), mock.patch.object(FileBasedCache, 'has_key', slow_has_key):
+            self.assert_single_rebuild()
+    
+    def test_file_lock_is_exclusive_and_expires(self):
+        with self.file_cache():
+            self.assertTrue(pagecache.acquire_lock('page'))
+            self.assertFalse(pagecache.acquire_lock('page'))
+            self.assertTrue(pagecache.is_locked('page'))
+            pagecache.release_lock('page')
+            self.assertTrue(pagecache.acquire_lock('page'))
+            # Блокировку упавшего процесса забирает следующий запрос
+            stale = time.time() - pagecache.LOCK_TIMEOUT - 1
+            os.utime(pagecache.lock_path('page'), (stale, stale))
+            self.assertFalse(pagecache.is_locked('page'))
+            self.assertTrue(pagecache.acquire_lock('page'))
@@ -0,0 +1,131 @@
+import json
+from datetime import timedelta
+from django.http import HttpResponse
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import path, reverse
+from django.utils import timezone
+from cinema.middleware import QueryBudgetExceeded, query_budget, stats
+from cinema.models import Movie
+from .helpers import create_hall, create_movie, create_sessions, create_tickets, create_user, reset_caches
+
+@query_budget(1)
+def two_queries(request):
+    Movie.objects.count()
+    Movie.objects.count()
+    return HttpResponse('ok')
+
+@query_budget(2)
+def within_budget(request):
+    Movie.objects.count()
+    return HttpResponse('ok')
+
+# Представления с заведомо известным числом запросов для проверки самого механизма бюджета
+urlpatterns = [
+    path('over-budget/', two_queries, name='over_budget'),
+    path('within-budget/', within_budget, name='within_budget'),
+]
+
+@override_settings(ROOT_URLCONF='cinema.tests.test_query_budgets', CINEMA_QUERY_BUDGET_STRICT=True)
+class QueryBudgetEnforcementTests(TestCase):
+    def test_exceeded_budget_fails_request(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/over-budget/')
+    
+    def test_request_within_budget_passes(self):
+        self.assertEqual(self.client.get('/within-budget/').status_code, 200)
+    
+    async def test_exceeded_budget_fails_request_under_asgi(self):
+        # Под ASGI цепочка middleware асинхронная, а синхронное представление идет через sync_to_async
+        with self.assertRaises(QueryBudgetExceeded):
+            await AsyncClient().get('/over-budget/')
+    
+    async def test_request_within_budget_passes_under_asgi(self):
+        response = await AsyncClient().get('/within-budget/')
+        self.assertEqual(response.status_code, 200)
+
+@override_settings(CINEMA_QUERY_BUDGET_STRICT=True)
+class ViewQueryBudgetTests(TestCase):
+    # Каждое представление с @query_budget: превышение бюджета роняет запрос
+    # исключением QueryBudgetExceeded, и тест падает
+    @classmethod
+    def setUpTestData(cls):
+        cls.movies = [create_movie('Фильм 1'), create_movie('Фильм 2')]
+        cls.halls = [create_hall('Зал 1'), create_hall('Зал 2', rows=5, seats_per_row=8)]
+        cls.user = create_user()
+        cls.staff = create_user('staff', is_staff=True)
+        cls.upcoming = create_sessions(6, cls.movies, cls.halls)
+        cls.past = create_sessions(6, cls.movies, cls.halls, start=timezone.now() - timedelta(days=3))
+        create_tickets(cls.upcoming + cls.past, 5, cls.user)
+    
+    def setUp(self):
+        reset_caches()
+    
+    def post_json(self, url, payload):
+        return self.client.post(url, json.dumps(payload), content_type='application/json')
+    
+    def test_home_and_movie_detail(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get(reverse('cinema:home')).status_code, 200)
+            self.assertEqual(
+                self.client.get(reverse('cinema:movie_detail', args=[self.movies[0].pk])).status_code, 200
+            )
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('cinema:home')).status_code, 200)
+    
+    def test_session_detail_and_booking(self):
+        session = self.upcoming[0]
+        self.client.force_login(self.user)
+        url = reverse('cinema:session_detail', args=[session.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.post(url, {'row': 5, 'seat': 5}).status_code, 302)
+        # Занятое место: форма с ошибкой
+        self.assertEqual(self.client.post(url, {'row': 5, 'seat': 5}).status_code, 200)
+    
+    def test_seat_endpoints(self):
+        session = self.upcoming[1]
+        self.client.force_login(self.user)
+        self.assertEqual(self.post_json(reverse('cinema:hold_seats', args=[session.pk]), {'seats': [[3, 1]]}).status_code, 201)
+        self.assertEqual(self.post_json(reverse('cinema:release_seats', args=[session.pk]), {}).status_code, 200)
+        response = self.post_json(reverse('cinema:book_seats', args=[session.pk]), {'seats': [[3, 1], [3, 2]]})
+        self.assertEqual(response.status_code, 201)
+        
+        url = reverse('cinema:check_seat_availability', args=[session.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+    
+    def test_profile_and_ticket_history(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('cinema:profile')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('cinema:profile'), {'archived': '1'}).status_code, 200)
+        response = self.client.get(reverse('cinema:ticket_history'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.client.get(reverse('cinema:ticket_history'), {'cursor': response.json()['next_cursor']}).status_code,
+            200
+        )
+    
+    def test_staff_views(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('cinema:manage_sessions')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('cinema:past_sessions')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('cinema:sales_report')).status_code, 200)
+        today = timezone.localdate()
+        for report_type in ('daily', 'weekly', 'monthly', 'by_movie', 'by_hall'):
+            response = self.client.post(reverse('cinema:sales_report'), {
+                'start_date': (today - timedelta(days=60)).isoformat(),
+                'end_date': today.isoformat(),
+                'report_type': report_type,
+            })
+            self.assertEqual(response.status_code, 200)
+    
+    async def test_home_under_asgi(self):
+        client = AsyncClient()
+        for _ in range(2):
+            self.assertEqual((await client.get(reverse('cinema:home'))).status_code, 200)
+    
+    async def test_queries_are_counted_under_asgi(self):
+        # Без замера под ASGI бюджеты молча не проверялись бы
+        stats.reset()
+        await AsyncClient().get(reverse('cinema:movie_detail', args=[self.movies[0].pk]))
+        self.assertGreater(stats.summary()['cinema:movie_detail']['queries']['max'], 0)
@@ -0,0 +1,45 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .helpers import create_hall, create_movie, create_sessions, create_tickets, create_user, reset_caches
+
+class QueryCountTests(TestCase):
+    # Число запросов главных страниц не зависит от числа сеансов и билетов:
+    # одна и та же страница проверяется на малом и на большом объеме данных
+    VOLUMES = (2, 40)
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.movies = [create_movie('Фильм 1'), create_movie('Фильм 2'), create_movie('Фильм 3')]
+        cls.halls = [create_hall('Зал 1'), create_hall('Зал 2', rows=5, seats_per_row=8)]
+        cls.user = create_user()
+        cls.staff = create_user('staff', is_staff=True)
+    
+    def seed(self, sessions):
+        # Будущие и прошедшие сеансы у всех фильмов в обоих залах, на каждый проданы билеты
+        upcoming = create_sessions(sessions, self.movies, self.halls)
+        past = create_sessions(
+            sessions, self.movies, self.halls, start=timezone.now() - timedelta(days=30), step=timedelta(hours=6)
+        )
+        create_tickets(upcoming + past, 5, self.user)
+        # Промах кэша: страница и афиша собираются из базы заново
+        reset_caches()
+    
+    def assert_constant_queries(self, url, num):
+        for volume in self.VOLUMES:
+            with self.subTest(sessions=volume):
+                self.seed(volume)
+                with self.assertNumQueries(num):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+    
+    def test_home(self):
+        self.assert_constant_queries(reverse('cinema:home'), 2)
+    
+    def test_movie_detail(self):
+        self.assert_constant_queries(reverse('cinema:movie_detail', args=[self.movies[0].pk]), 2)
+    
+    def test_manage_sessions(self):
+        self.client.force_login(self.staff)
+        self.assert_constant_queries(reverse('cinema:manage_sessions'), 6)
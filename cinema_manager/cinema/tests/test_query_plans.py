@@ -0,0 +1,51 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from cinema.management.commands.explain_queries import Command, full_scan_tables
+from .helpers import create_hall, create_movie, create_sessions, create_tickets, create_user
+
+# Индекс, который должен стоять в плане каждого запроса explain_queries
+EXPECTED_INDEXES = {
+    'ticket_export': 'ticket_paid_purchase_idx',
+    'session_paid_tickets': 'ticket_session_paid_idx',
+    'hall_schedule': 'session_hall_start_idx',
+    'upcoming_schedule': 'session_start_id_idx',
+    'movie_schedule': 'session_movie_start_idx',
+    'ticket_history': 'ticket_user_purchase_idx',
+}
+
+class QueryPlanTests(TestCase):
+    # Имена индексов unique_together (схема зала, сводка продаж) зависят от СУБД,
+    # поэтому для этих запросов проверяется только отсутствие полного просмотра
+    @classmethod
+    def setUpTestData(cls):
+        movies = [create_movie('Фильм 1'), create_movie('Фильм 2')]
+        halls = [create_hall('Зал 1'), create_hall('Зал 2'), create_hall('Зал 3')]
+        users = [create_user('buyer'), create_user('other')]
+        now = timezone.now()
+        past = create_sessions(100, movies, halls, start=now - timedelta(days=20), step=timedelta(hours=4))
+        upcoming = create_sessions(100, movies, halls)
+        create_tickets(past[::2], 20, users[0], purchase_time=now - timedelta(days=3))
+        create_tickets(past[1::2], 20, users[1], is_paid=False, purchase_time=now - timedelta(days=10))
+        create_tickets(upcoming[:50], 20, users[1])
+        call_command('rebuild_sales_rollup', stdout=StringIO())
+    
+    def explain(self, queryset):
+        vendor = connection.vendor
+        plan = queryset.explain(**({'format': 'json'} if vendor == 'mysql' else {}))
+        return plan, full_scan_tables(plan, vendor)
+    
+    def test_queries_use_expected_indexes(self):
+        for name, queryset in Command().queries(days=7).items():
+            with self.subTest(query=name):
+                plan, full_scans = self.explain(queryset)
+                self.assertEqual(full_scans, set(), plan)
+                if name in EXPECTED_INDEXES:
+                    self.assertIn(EXPECTED_INDEXES[name], plan)
+    
+    def test_command_passes(self):
+        # Команда падает с CommandError, если какой-то запрос читает таблицу целиком
+        call_command('explain_queries', stdout=StringIO())
@@ -0,0 +1,77 @@
+import json
+from django.db import connections
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from cinema import routers
+from cinema.models import Movie, Ticket
+from .helpers import create_hall, create_movie, create_sessions, create_user, reset_caches
+
+@override_settings(CINEMA_READ_REPLICA='replica')
+class ReplicaRoutingTests(TestCase):
+    # default и replica - разные базы без репликации между ними,
+    # поэтому по данным и по журналу запросов видно, какая база ответила
+    databases = {'default', 'replica'}
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = create_movie('Из основной базы')
+        cls.session = create_sessions(1, [cls.movie], [create_hall()])[0]
+        cls.user = create_user()
+    
+    def setUp(self):
+        reset_caches()
+        self.client.force_login(self.user)
+    
+    def capture(self):
+        return CaptureQueriesContext(connections['default']), CaptureQueriesContext(connections['replica'])
+    
+    def test_reads_go_to_replica(self):
+        create_movie('Из реплики', using='replica')
+        request = RequestFactory().get('/')
+        with routers.read_from_replica(request):
+            self.assertEqual(list(Movie.objects.values_list('title', flat=True)), ['Из реплики'])
+        self.assertEqual(list(Movie.objects.values_list('title', flat=True)), ['Из основной базы'])
+        
+        primary, replica = self.capture()
+        with primary, replica:
+            response = self.client.get(reverse('cinema:profile'))
+        self.assertEqual(response.status_code, 200)
+        # Сессия и пользователь читаются до @replica_reads, билеты - из реплики
+        self.assertTrue(any('cinema_ticket' in query['sql'] for query in replica.captured_queries))
+        self.assertFalse(any('cinema_ticket' in query['sql'] for query in primary.captured_queries))
+    
+    def test_writes_go_to_primary(self):
+        request = RequestFactory().get('/')
+        with routers.read_from_replica(request):
+            movie = Movie.objects.create(
+                title='Новый', description='', duration=90, poster='', age_rating=0,
+                genre='Драма', director='Режиссер', release_date=self.movie.release_date
+            )
+            self.assertEqual(movie._state.db, 'default')
+        self.assertTrue(Movie.objects.using('default').filter(pk=movie.pk).exists())
+        self.assertFalse(Movie.objects.using('replica').filter(title='Новый').exists())
+    
+    def test_purchase_pins_reads_to_primary(self):
+        response = self.client.post(
+            reverse('cinema:book_seats', args=[self.session.pk]),
+            json.dumps({'seats': [[1, 1]]}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        self.assertTrue(Ticket.objects.using('default').filter(session=self.session).exists())
+        self.assertFalse(Ticket.objects.using('replica').exists())
+        
+        # Пока действует cookie, свежая покупка видна в профиле: реплика не опрашивается
+        primary, replica = self.capture()
+        with primary, replica:
+            response = self.client.get(reverse('cinema:profile'))
+        self.assertEqual(replica.captured_queries, [])
+        self.assertContains(response, 'Из основной базы')
+        
+        # Без cookie профиль снова читает реплику, где покупки еще нет
+        del self.client.cookies[routers.PIN_COOKIE]
+        with self.capture()[1] as replica:
+            response = self.client.get(reverse('cinema:profile'))
+        self.assertNotEqual(replica.captured_queries, [])
+        self.assertNotContains(response, 'Из основной базы')
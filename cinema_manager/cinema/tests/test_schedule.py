@@ -0,0 +1,59 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from cinema import schedule
+from .helpers import create_hall, create_movie, create_sessions, reset_caches
+
+class ScheduleCacheTests(TestCase):
+    # Записи афиши в кэше ограничены: главная хранит только ближайшие сеансы,
+    # страница фильма - только его сеансы, как бы ни росло расписание
+    @classmethod
+    def setUpTestData(cls):
+        cls.movies = [create_movie('Фильм 1'), create_movie('Фильм 2')]
+        cls.start = timezone.now() + timedelta(hours=1)
+        cls.sessions = create_sessions(30, cls.movies, [create_hall()], start=cls.start, step=timedelta(hours=1))
+    
+    def setUp(self):
+        reset_caches()
+    
+    def cached(self, key):
+        return cache.get(f'{schedule.CACHE_KEY}:{key}')[1]
+    
+    def ids(self, entries):
+        return [entry.id for entry in entries]
+    
+    def test_home_keeps_only_nearest_sessions(self):
+        entries = schedule.home_sessions()
+        self.assertEqual(self.ids(entries), [session.pk for session in self.sessions[:schedule.HOME_SESSIONS]])
+        self.assertEqual(len(self.cached('home')), schedule.HOME_SESSIONS)
+        with self.assertNumQueries(0):
+            self.assertEqual(schedule.home_sessions(), entries)
+    
+    def test_home_refills_after_sessions_start(self):
+        schedule.home_sessions()
+        # Два первых сеанса начались: срез дополняется следующими из базы
+        later = self.start + timedelta(hours=1, minutes=30)
+        with self.assertNumQueries(1):
+            entries = schedule.home_sessions(later)
+        self.assertEqual(self.ids(entries), [session.pk for session in self.sessions[2:2 + schedule.HOME_SESSIONS]])
+        self.assertEqual(schedule.next_start(now=later), self.sessions[2].start_time)
+    
+    def test_movie_entry_holds_only_its_sessions(self):
+        movie = self.movies[1]
+        expected = [session.pk for session in self.sessions if session.movie_id == movie.pk]
+        self.assertEqual(self.ids(schedule.movie_sessions(movie.pk)), expected)
+        self.assertEqual(self.ids(self.cached(f'movie:{movie.pk}')), expected)
+        
+        # Начавшиеся сеансы отбрасываются при чтении без запроса к базе
+        later = self.start + timedelta(hours=2)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ids(schedule.movie_sessions(movie.pk, later)), expected[1:])
+        self.assertEqual(schedule.next_start(movie.pk, later), self.sessions[3].start_time)
+    
+    def test_invalidation_rebuilds_entries(self):
+        schedule.movie_sessions(self.movies[0].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sessions[0].delete()
+        self.assertNotIn(self.sessions[0].pk, self.ids(schedule.movie_sessions(self.movies[0].pk)))
+        self.assertNotIn(self.sessions[0].pk, self.ids(schedule.home_sessions()))
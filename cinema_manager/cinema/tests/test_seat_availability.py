@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from cinema import occupancy
+from .helpers import create_hall, create_movie, create_sessions, create_tickets, create_user, reset_caches
+
+class SeatAvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = create_sessions(1, [create_movie()], [create_hall()])[0]
+        cls.user = create_user()
+    
+    def setUp(self):
+        reset_caches()
+    
+    def url(self, session_id):
+        return reverse('cinema:check_seat_availability', args=[session_id])
+    
+    def test_unknown_session_is_not_found(self):
+        # Ни опрос с версией, ни ?since= не должны заводить ключ версии для несуществующего сеанса
+        missing = self.session.pk + 1000
+        self.assertEqual(self.client.get(self.url(missing), HTTP_IF_NONE_MATCH=f'"{missing}-1"').status_code, 404)
+        self.assertEqual(self.client.get(self.url(missing), {'since': '1'}).status_code, 404)
+        self.assertIsNone(cache.get(occupancy.version_key(missing)))
+    
+    def test_cached_version_answers_without_queries(self):
+        response = self.client.get(self.url(self.session.pk))
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url(self.session.pk), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+    
+    def test_deleted_session_is_not_found(self):
+        create_tickets([self.session], 2, self.user)
+        self.assertEqual(self.client.get(self.url(self.session.pk)).status_code, 200)
+        session_id = self.session.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.delete()
+        self.assertEqual(self.client.get(self.url(session_id)).status_code, 404)
+        self.assertIsNone(cache.get(occupancy.version_key(session_id)))
@@ -8,10 +8,21 @@ urlpatterns = [
     path('movies/<int:movie_id>/', views.movie_detail, name='movie_detail'),  
     path('sessions/<int:session_id>/', views.session_detail, name='session_detail'),  
     path('sessions/<int:session_id>/check_seats/', views.check_seat_availability, name='check_seat_availability'),
+    path('sessions/<int:session_id>/book/', views.book_seats, name='book_seats'),
+    path('sessions/<int:session_id>/hold/', views.hold_seats, name='hold_seats'),
+    path('sessions/<int:session_id>/release/', views.release_seats, name='release_seats'),
+    path('sessions/<int:session_id>/events/', views.seat_events, name='seat_events'),
+    path('sessions/<int:session_id>/discount/', views.apply_discount, name='apply_discount'),
+    path('posters/<str:filename>', views.poster_variant, name='poster_variant'),
     path('register/', views.register, name='register'),
     path('profile/', views.profile, name='profile'),
+    path('profile/tickets/', views.ticket_history, name='ticket_history'),
     
     # Staff-only URLs
     path('manage/sessions/', views.manage_sessions, name='manage_sessions'),
+    path('manage/sessions/past/', views.past_sessions, name='past_sessions'),
+    path('manage/sessions/import/', views.import_schedule, name='import_schedule'),
     path('reports/sales/', views.sales_report, name='sales_report'),
+    path('reports/analytics/', views.analytics_report, name='analytics_report'),
+    path('reports/performance/', views.performance_report, name='performance_report'),
 ]
\ No newline at end of file
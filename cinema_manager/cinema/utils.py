@@ -13,4 +13,53 @@ def calculate_final_price(base_price, user=None, discount=None):
         if age >= 60:
             final_price *= Decimal('0.9')  
     
-    return final_price.quantize(Decimal('0.00'))  
\ No newline at end of file
+    return final_price.quantize(Decimal('0.00'))  
+
+SENIOR_AGE = 60
+SENIOR_FACTOR = Decimal('0.9')
+CENT = Decimal('0.00')
+
+def calculate_final_prices(items, today=None):
+    # Пакетный вариант calculate_final_price для списка (base_price, user, discount).
+    # Дата, возраст пользователя и множитель скидки считаются один раз на пользователя
+    # и процент, а одинаковые сочетания цены и множителя - один раз на пакет.
+    # Результаты совпадают с calculate_final_price: умножение Decimal на эти множители точное
+    today = today or timezone.now().date()
+    seniors = {}
+    factors = {}
+    prices = {}
+    result = []
+    
+    for base_price, user, discount in items:
+        senior = False
+        if user and user.birth_date:
+            key = user.pk if user.pk is not None else id(user)
+            senior = seniors.get(key)
+            if senior is None:
+                senior = seniors[key] = (today - user.birth_date).days // 365 >= SENIOR_AGE
+        
+        percent = discount.discount_percent if discount else None
+        factor_key = (percent, senior)
+        factor = factors.get(factor_key)
+        if factor is None:
+            factor = Decimal(1)
+            if percent is not None:
+                factor *= Decimal(1) - Decimal(str(percent)) / Decimal(100)
+            if senior:
+                factor *= SENIOR_FACTOR
+            factors[factor_key] = factor
+        
+        price_key = (base_price, factor_key)
+        price = prices.get(price_key)
+        if price is None:
+            price = prices[price_key] = (Decimal(str(base_price)) * factor).quantize(CENT)
+        result.append(price)
+    
+    return result
+
+def percentile(values, percent):
+    # Перцентиль по методу ближайшего ранга; values должен быть отсортирован
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, -(-len(values) * percent // 100) - 1))
+    return values[int(index)]
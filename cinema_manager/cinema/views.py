@@ -1,19 +1,39 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import get_user
+from django.views.decorators.http import require_POST
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, FileResponse, HttpResponseBadRequest, HttpResponseNotAllowed, HttpResponseNotModified, StreamingHttpResponse, Http404
+from django.utils.cache import patch_cache_control
+from django.db import connections
+from django.core.files.storage import default_storage
 from django.db.models import Sum, Count
-from .models import Movie, Session, Hall, Ticket, Discount
-from .forms import UserRegistrationForm, TicketBookingForm, DiscountApplyForm, SessionForm
-from .reports import generate_sales_report
+from asgiref.sync import sync_to_async
+from .models import ArchivedTicket, Movie, Session, Hall, Ticket
+from .forms import (
+    UserRegistrationForm, TicketBookingForm, DiscountApplyForm, SessionForm, ScheduleImportForm, AnalyticsReportForm
+)
+from .reports import generate_sales_report, iter_ticket_rows, parse_report_date
+from . import analytics, booking, booking_queue, discounts, holds, occupancy, posters, routers, schedule, schedule_import, seatmap
+from .events import seat_event_stream
+from .exports import streaming_csv_response, REPORT_HEADER, TICKETS_HEADER
 from .utils import calculate_final_price
-import csv
+from .pagination import keyset_page, InvalidCursor
+from .middleware import query_budget, stats as performance_stats
+from .routers import replica_reads
+from .pagecache import cache_anonymous_page
 from datetime import timedelta
+import json
+import logging
 
+logger = logging.getLogger(__name__)
+
+@cache_anonymous_page(lambda: schedule.next_start())
+@query_budget(4)
+@replica_reads
 def home(request):
-    now = timezone.localtime()
-    upcoming_sessions = Session.objects.filter(start_time__gte=now).order_by('start_time')[:10]
+    upcoming_sessions = schedule.home_sessions()
     movies = Movie.objects.all()
     
     context = {
@@ -22,10 +42,12 @@ def home(request):
     }
     return render(request, 'cinema/home.html', context)
 
+@cache_anonymous_page(lambda movie_id: schedule.next_start(movie_id))
+@query_budget(4)
+@replica_reads
 def movie_detail(request, movie_id):
     movie = get_object_or_404(Movie, pk=movie_id)
-    now = timezone.localtime()
-    sessions = Session.objects.filter(movie=movie, start_time__gte=now).order_by('start_time')
+    sessions = schedule.movie_sessions(movie.pk)
     
     context = {
         'movie': movie,
@@ -33,30 +55,26 @@ def movie_detail(request, movie_id):
     }
     return render(request, 'cinema/movie_detail.html', context)
 
+@query_budget(12)
 def session_detail(request, session_id):
-    session = get_object_or_404(Session, pk=session_id)
-    booked_seats = Ticket.objects.filter(session=session).values_list('row', 'seat')
+    session = get_object_or_404(Session.objects.select_related('movie', 'hall'), pk=session_id)
     
     if request.method == 'POST' and request.user.is_authenticated:
         form = TicketBookingForm(request.POST, session=session)
         discount_form = DiscountApplyForm(request.POST)
         
         if form.is_valid():
-            ticket = form.save(commit=False)
-            ticket.session = session
-            ticket.user = request.user
-            
             discount = None
             if discount_form.is_valid():
-                discount_code = discount_form.cleaned_data['discount_code']
-                try:
-                    discount = Discount.objects.get(code=discount_code, is_active=True)
-                except Discount.DoesNotExist:
-                    pass
+                discount = discounts.get_discount(discount_form.cleaned_data['discount_code'])
             
-            ticket.price = calculate_final_price(session.base_price, request.user, discount)
-            ticket.save()
-            return redirect('profile')
+            # Место занимается самой вставкой: при гонке уникальный индекс отклонит
+            # вторую покупку, и пользователь увидит ошибку формы вместо 500
+            seat = (form.cleaned_data['row'], form.cleaned_data['seat'])
+            result = booking_queue.book_seats(session, request.user, [seat], discount)
+            if result.created:
+                return routers.pin_to_primary(redirect('cinema:profile'))
+            form.add_error(None, 'Это место уже занято')
     else:
         form = TicketBookingForm(session=session)
         discount_form = DiscountApplyForm()
@@ -65,12 +83,95 @@ def session_detail(request, session_id):
         'session': session,
         'form': form,
         'discount_form': discount_form,
-        'booked_seats_as_strings': booked_seats,
-        'rows_range': range(1, session.hall.seats_rows + 1),
-        'seats_range': range(1, session.hall.seats_per_row + 1),
+        'seat_map_html': seatmap.get_html(session),
     }
     return render(request, 'cinema/session_detail.html', context)
 
+def read_seats_payload(request):
+    # Тело запроса вида {"seats": [[ряд, место], ...], ...}
+    payload = json.loads(request.body or '{}')
+    return payload, booking.parse_seats(payload.get('seats', []))
+
+def seats_error_response(result):
+    if result.invalid:
+        return JsonResponse({'error': 'Указаны несуществующие места', 'invalid': result.invalid}, status=400)
+    return JsonResponse({'error': 'Часть мест уже занята', 'conflicts': result.conflicts}, status=409)
+
+@query_budget(12)
+@login_required
+@require_POST
+def book_seats(request, session_id):
+    # Бронирование нескольких мест одним запросом: {"seats": [[ряд, место], ...], "discount_code": "..."}
+    session = get_object_or_404(Session.objects.select_related('hall'), pk=session_id)
+    
+    try:
+        payload, seats = read_seats_payload(request)
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Некорректный список мест'}, status=400)
+    
+    if not seats or len(seats) > booking.MAX_SEATS_PER_BOOKING:
+        return JsonResponse(
+            {'error': f'Можно забронировать от 1 до {booking.MAX_SEATS_PER_BOOKING} мест'},
+            status=400
+        )
+    
+    discount = discounts.get_discount(payload.get('discount_code'))
+    
+    result = booking_queue.book_seats(session, request.user, seats, discount)
+    if not result.created:
+        return seats_error_response(result)
+    
+    response = JsonResponse({
+        'tickets': [
+            {'row': ticket.row, 'seat': ticket.seat, 'price': str(ticket.price)}
+            for ticket in result.created
+        ],
+        'total': str(sum(ticket.price for ticket in result.created)),
+    }, status=201)
+    return routers.pin_to_primary(response)
+
+@query_budget(10)
+@login_required
+@require_POST
+def hold_seats(request, session_id):
+    # Временно удерживает места, пока покупатель вводит скидку или оплачивает
+    session = get_object_or_404(Session.objects.select_related('hall'), pk=session_id)
+    
+    try:
+        _, seats = read_seats_payload(request)
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Некорректный список мест'}, status=400)
+    
+    if not seats or len(seats) > booking.MAX_SEATS_PER_BOOKING:
+        return JsonResponse(
+            {'error': f'Можно удержать от 1 до {booking.MAX_SEATS_PER_BOOKING} мест'},
+            status=400
+        )
+    
+    result = holds.create_holds(session, request.user, seats)
+    if not result.created:
+        return seats_error_response(result)
+    
+    return JsonResponse({
+        'seats': seats,
+        'expires_at': result.created[0].expires_at.isoformat(),
+    }, status=201)
+
+@query_budget(8)
+@login_required
+@require_POST
+def release_seats(request, session_id):
+    # Снимает удержания пользователя: перечисленные места или все в сеансе
+    session = get_object_or_404(Session, pk=session_id)
+    
+    try:
+        _, seats = read_seats_payload(request)
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Некорректный список мест'}, status=400)
+    
+    released = holds.release_holds(session, request.user, seats or None)
+    return JsonResponse({'released': released})
+
 def register(request):
     if request.method == 'POST':
         form = UserRegistrationForm(request.POST)
@@ -82,69 +183,171 @@ def register(request):
     
     return render(request, 'cinema/register.html', {'form': form})
 
+@query_budget(5)
 @login_required
+@replica_reads
 def profile(request):
     if not request.user.is_authenticated:
         return redirect('login') 
     
     try:
-        user_tickets = Ticket.objects.filter(user=request.user).select_related(
-            'session__movie',
-            'session__hall'
-        ).order_by('-purchase_time')
+        archived = show_archived(request)
+        tickets = user_ticket_history(request.user, archived)
+        try:
+            page = keyset_page(tickets, 'purchase_time', request.GET.get('cursor'))
+        except InvalidCursor:
+            # Испорченная или устаревшая ссылка - показываем первую страницу, как manage_sessions
+            page = keyset_page(tickets, 'purchase_time')
         
         context = {
-            'tickets': user_tickets,
+            'tickets': page.items,
+            'next_cursor': page.next_cursor,
+            'archived': archived,
             'user': request.user 
         }
         return render(request, 'cinema/profile.html', context)
         
     except Exception as e:
-        #(на продакшне logging)
-        print(f"Error in profile view: {e}")
+        logger.exception('Error in profile view')
         return render(request, 'cinema/error.html', {'error': str(e)})
 
+def show_archived(request):
+    # ?archived=1 - билеты, перенесенные в архив командой archive_tickets
+    return request.GET.get('archived') == '1'
+
+def user_ticket_history(user, archived=False):
+    model = ArchivedTicket if archived else Ticket
+    return model.objects.filter(user=user).select_related('session__movie', 'session__hall')
+
+def ticket_row(ticket):
+    return {
+        'id': ticket.pk,
+        'movie': ticket.session.movie.title,
+        'start_time': timezone.localtime(ticket.session.start_time).strftime('%d.%m.%Y %H:%M'),
+        'hall': ticket.session.hall.name,
+        'row': ticket.row,
+        'seat': ticket.seat,
+        'price': str(ticket.price),
+        'is_paid': ticket.is_paid,
+    }
+
+@query_budget(5)
+@login_required
+@replica_reads
+def ticket_history(request):
+    # Следующая страница истории билетов для кнопки "Показать еще"
+    try:
+        page = keyset_page(
+            user_ticket_history(request.user, show_archived(request)), 'purchase_time', request.GET.get('cursor')
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'tickets': [ticket_row(ticket) for ticket in page.items],
+        'next_cursor': page.next_cursor,
+    }, json_dumps_params={'ensure_ascii': False})
+
+def past_sessions_queryset(now):
+    return Session.objects.filter(start_time__lt=now).select_related('movie', 'hall')
+
+@query_budget(6)
 @staff_member_required
 def manage_sessions(request):
     if request.method == 'POST':
         form = SessionForm(request.POST)
         if form.is_valid():
             form.save()
-            return redirect('manage_sessions')
+            return redirect('cinema:manage_sessions')
     else:
         form = SessionForm()
     
-    now = timezone.localtime()
-    upcoming_sessions = Session.objects.filter(start_time__gte=now).order_by('start_time')
-    past_sessions = Session.objects.filter(start_time__lt=now).order_by('-start_time')
+    now = timezone.now()
+    # Полный список нужен только персоналу и в кэш не кладется: тот же один запрос с JOIN
+    upcoming_sessions = schedule.build_schedule(now)
+    try:
+        past_page = keyset_page(past_sessions_queryset(now), 'start_time', request.GET.get('cursor'))
+    except InvalidCursor:
+        past_page = keyset_page(past_sessions_queryset(now), 'start_time')
     
     context = {
         'form': form,
         'upcoming_sessions': upcoming_sessions,
-        'past_sessions': past_sessions,
+        'past_sessions': past_page.items,
+        'next_cursor': past_page.next_cursor,
     }
     return render(request, 'cinema/manage_sessions.html', context)
 
 @staff_member_required
+def import_schedule(request):
+    result = None
+    if request.method == 'POST':
+        form = ScheduleImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            lines = (line.decode('utf-8-sig') for line in form.cleaned_data['file'])
+            try:
+                result = schedule_import.import_schedule(lines, dry_run=form.cleaned_data['dry_run'])
+            except (ValueError, UnicodeDecodeError) as e:
+                form.add_error('file', str(e))
+    else:
+        form = ScheduleImportForm()
+    
+    return render(request, 'cinema/import_schedule.html', {'form': form, 'result': result})
+
+@query_budget(5)
+@staff_member_required
+@replica_reads
+def past_sessions(request):
+    try:
+        page = keyset_page(past_sessions_queryset(timezone.now()), 'start_time', request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'sessions': [
+            {
+                'id': session.pk,
+                'movie': session.movie.title,
+                'hall': session.hall.name,
+                'start_time': timezone.localtime(session.start_time).strftime('%d.%m.%Y %H:%M'),
+                'base_price': str(session.base_price),
+            }
+            for session in page.items
+        ],
+        'next_cursor': page.next_cursor,
+    }, json_dumps_params={'ensure_ascii': False})
+
+@query_budget(5)
+@staff_member_required
+@replica_reads
 def sales_report(request):
     if request.method == 'POST':
         start_date = request.POST.get('start_date')
         end_date = request.POST.get('end_date')
         report_type = request.POST.get('report_type')
         
+        # Даты проверяются до ответа: потоковая выгрузка упала бы на середине, уже отдав 200
+        try:
+            start_date = parse_report_date(start_date)
+            end_date = parse_report_date(end_date)
+        except (TypeError, ValueError):
+            return HttpResponseBadRequest('Укажите даты в формате ГГГГ-ММ-ДД')
+        
+        # Построчная выгрузка билетов бывает только в CSV
+        if report_type == 'tickets':
+            return streaming_csv_response(
+                f'tickets_{start_date}_to_{end_date}.csv',
+                TICKETS_HEADER,
+                # Итератор дочитывается уже после выхода из представления
+                iter_ticket_rows(start_date, end_date, using=routers.current_read_alias())
+            )
+        
         report_data = generate_sales_report(start_date, end_date, report_type)
         
         if 'export_csv' in request.POST:
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="sales_report_{start_date}_to_{end_date}.csv"'
-            
-            writer = csv.writer(response)
-            writer.writerow(['Период', 'Количество билетов', 'Общая выручка'])
-            
-            for row in report_data:
-                writer.writerow(row)
-            
-            return response
+            return streaming_csv_response(
+                f'sales_report_{start_date}_to_{end_date}.csv',
+                REPORT_HEADER,
+                report_data
+            )
         
         context = {
             'report_data': report_data,
@@ -166,7 +369,124 @@ def sales_report(request):
     }
     return render(request, 'cinema/sales_report.html', context)
 
+@staff_member_required
+@replica_reads
+def analytics_report(request):
+    # Отчеты cinema.analytics: билеты читаются пачками, поэтому число запросов
+    # растет с объемом периода и бюджета запросов у представления нет
+    if 'report_type' in request.GET:
+        form = AnalyticsReportForm(request.GET)
+    else:
+        end_date = timezone.localdate()
+        form = AnalyticsReportForm(initial={
+            'start_date': end_date - timedelta(days=30), 'end_date': end_date, 'report_type': 'fill_rate',
+        })
+    
+    header, rows = None, None
+    if form.is_bound and form.is_valid():
+        start_date = form.cleaned_data['start_date']
+        end_date = form.cleaned_data['end_date']
+        report_type = form.cleaned_data['report_type']
+        header, rows = analytics.generate_report(start_date, end_date, report_type)
+        
+        if 'export_csv' in request.GET:
+            return streaming_csv_response(f'{report_type}_{start_date}_to_{end_date}.csv', header, rows)
+    
+    return render(request, 'cinema/analytics_report.html', {'form': form, 'header': header, 'rows': rows})
+
+@query_budget(5)
 def check_seat_availability(request, session_id):
-    session = get_object_or_404(Session, pk=session_id)
-    booked_seats = list(Ticket.objects.filter(session=session).values_list('row', 'seat'))
-    return JsonResponse({'booked_seats': booked_seats})
\ No newline at end of file
+    # Клиенты опрашивают схему постоянно: неизменившаяся версия отдается как 304,
+    # а ?since=<версия> возвращает только изменения, обе ветки без запросов к БД
+    session = None
+    version = occupancy.get_version(session_id, create=False)
+    if version is None:
+        # Версии еще нет: сеанс проверяется до ее создания, иначе любой id
+        # оставлял бы в кэше бессрочный ключ и получал 200/304 вместо 404
+        session = get_object_or_404(Session.objects.select_related('hall'), pk=session_id)
+        version = occupancy.get_version(session_id)
+    etag = f'"{session_id}-{version}"'
+    
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        changes = None
+        since = request.GET.get('since', '')
+        if since.isdigit():
+            changes = occupancy.changes_since(session_id, int(since), version)
+        
+        if changes is not None:
+            booked, released = changes
+            response = JsonResponse({'version': version, 'booked': booked, 'released': released})
+        else:
+            seat_map = occupancy.load_seat_map(session_id, version)
+            if seat_map is None:
+                if session is None:
+                    session = get_object_or_404(Session.objects.select_related('hall'), pk=session_id)
+                seat_map = occupancy.get_seat_map(session)
+            response = JsonResponse({'version': version, 'booked_seats': seat_map.booked_seats()})
+    
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+async def seat_events(request, session_id):
+    # Поток SSE с изменениями схемы зала; держится корутиной, а не потоком воркера
+    if not await Session.objects.filter(pk=session_id).aexists():
+        raise Http404
+    # Иначе каждое открытое подключение держало бы свое соединение с БД до закрытия потока
+    await sync_to_async(connections.close_all)()
+    
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    last_version = int(last_event_id) if last_event_id.isdigit() else None
+    
+    response = StreamingHttpResponse(
+        seat_event_stream(session_id, last_version),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def apply_discount(request, session_id):
+    # Предпросмотр цены со скидкой для кнопки "Применить" без отправки формы брони.
+    # require_POST в Django 4.2 не поддерживает асинхронные представления
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    
+    base_price = await Session.objects.filter(pk=session_id).values_list('base_price', flat=True).afirst()
+    if base_price is None:
+        raise Http404
+    
+    user = await sync_to_async(get_user)(request)
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Необходимо войти'}, status=403)
+    
+    code = request.POST.get('discount_code', '').strip()
+    discount = await discounts.aget_discount(code)
+    final_price = calculate_final_price(base_price, user, discount)
+    
+    data = {
+        'valid': discount is not None,
+        'base_price': str(base_price),
+        'final_price': str(final_price),
+    }
+    if discount:
+        data['discount_percent'] = discount.discount_percent
+    elif code:
+        data['error'] = 'Код скидки недействителен'
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+def poster_variant(request, filename):
+    # Имена вариантов содержат хэш содержимого, поэтому файл по одному URL не меняется
+    path = posters.variant_path(filename)
+    if not filename.endswith('.jpg') or not default_storage.exists(path):
+        raise Http404
+    response = FileResponse(default_storage.open(path, 'rb'), content_type='image/jpeg')
+    patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    return response
+
+@staff_member_required
+def performance_report(request):
+    # Перцентили времени ответа и SQL по представлениям за последние запросы этого процесса
+    return JsonResponse(performance_stats.summary(), json_dumps_params={'ensure_ascii': False})
\ No newline at end of file
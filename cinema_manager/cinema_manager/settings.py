@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cinema.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -95,6 +96,29 @@ DATABASES = {
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
         },
+        # Соединение живет между запросами и проверяется перед повторным использованием
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Реплика для отчетов, афиши и списков админки (см. CINEMA_READ_REPLICA):
+    # 'replica': {
+    #     ... те же параметры, HOST реплики ...
+    #     'TEST': {'MIRROR': 'default'},
+    # },
+}
+
+DATABASE_ROUTERS = ['cinema.routers.ReplicaRouter']
+
+# Кэш обязан быть общим для всех воркеров: в нем лежат версии и схемы занятости мест
+# (cinema.occupancy, ETag опроса схемы), поколение и копия афиши (cinema.schedule)
+# и страницы для анонимных посетителей (cinema.pagecache). У LocMemCache в каждом
+# процессе свой кэш: покупка в одном воркере не сбросила бы схему зала и ETag
+# в остальных до истечения CACHE_TIMEOUT. Счетчики версий меняются через incr,
+# поэтому нужен бэкенд с атомарным incr - Redis или Memcached
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
     }
 }
 
@@ -148,3 +172,44 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 AUTH_USER_MODEL = 'cinema.User'
 LOGIN_REDIRECT_URL = 'cinema:profile'
 LOGOUT_REDIRECT_URL = 'cinema:home'
+
+# Брокер событий схемы зала для SSE (cinema.events); в одном процессе хватает
+# LocalBroker, для нескольких воркеров подставляется свой класс с тем же интерфейсом
+CINEMA_EVENT_BROKER = 'cinema.events.LocalBroker'
+
+# Сколько секунд место удерживается за покупателем (cinema.holds)
+CINEMA_SEAT_HOLD_SECONDS = 10 * 60
+
+# Кэш кодов скидок в памяти процесса: размер и время жизни записи, сек
+CINEMA_DISCOUNT_CACHE_SIZE = 256
+CINEMA_DISCOUNT_CACHE_SECONDS = 60
+
+# Потоки фоновой генерации уменьшенных постеров (cinema.posters)
+CINEMA_POSTER_WORKERS = 2
+
+# Групповая запись покупок (cinema.booking_queue): заявки копятся не дольше WAIT_MS
+# и записываются пачками до BATCH штук; при переполненной очереди или ожидании дольше
+# TIMEOUT секунд покупка идет обычным путем. Очередь своя у каждого процесса
+CINEMA_BOOKING_QUEUE = False
+CINEMA_BOOKING_QUEUE_BATCH = 50
+CINEMA_BOOKING_QUEUE_WAIT_MS = 5
+CINEMA_BOOKING_QUEUE_SIZE = 1000
+CINEMA_BOOKING_QUEUE_TIMEOUT = 2.0
+
+# Псевдоним реплики из DATABASES для представлений с @replica_reads (None - все в default)
+# и сколько секунд после покупки чтения пользователя идут в основную базу
+CINEMA_READ_REPLICA = None
+CINEMA_REPLICA_PIN_SECONDS = 30
+
+# Через сколько дней после окончания сеанса его билеты переносятся в архив (archive_tickets)
+CINEMA_ARCHIVE_AFTER_DAYS = 90
+
+# Сколько секунд страница афиши для анонимных посетителей (cinema.pagecache) считается
+# свежей, если раньше ее не сбросили изменения фильмов и сеансов или начало сеанса
+CINEMA_PAGE_CACHE_SECONDS = 10 * 60
+
+# Замеры cinema.middleware.QueryInstrumentationMiddleware: размер окна на представление
+# и падение запроса при превышении бюджета SQL-запросов (@query_budget). В работе превышение
+# только пишется в лог; строгий режим включает профиль тестов (settings_test)
+CINEMA_PERFORMANCE_WINDOW = 1000
+CINEMA_QUERY_BUDGET_STRICT = False
@@ -0,0 +1,47 @@
+# Профиль для нагрузочных замеров без MySQL:
+#   DJANGO_SETTINGS_MODULE=cinema_manager.settings_bench python manage.py migrate --run-syncdb
+#   DJANGO_SETTINGS_MODULE=cinema_manager.settings_bench python manage.py generate_bench_data
+#   DJANGO_SETTINGS_MODULE=cinema_manager.settings_bench python manage.py run_benchmarks --output bench.json
+# CINEMA_BENCH_DB=:memory: держит базу в памяти процесса (данные генерируются в том же запуске)
+from .settings import *  # noqa: F401,F403
+
+BENCH_DB = os.environ.get('CINEMA_BENCH_DB', os.path.join(BASE_DIR, 'bench.sqlite3'))
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        # Общая для всех потоков база в памяти, как у тестового раннера Django
+        'NAME': 'file:benchdb?mode=memory&cache=shared' if BENCH_DB == ':memory:' else BENCH_DB,
+        'OPTIONS': {
+            'timeout': 30,
+        },
+    }
+}
+
+# CINEMA_BENCH_REPLICA=<путь> подключает второй файл SQLite как реплику для проверки
+# маршрутизации чтений (файл - копия основной базы, "отставание" задается вручную)
+if os.environ.get('CINEMA_BENCH_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['CINEMA_BENCH_REPLICA'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    CINEMA_READ_REPLICA = 'replica'
+
+# Замеры идут в одном процессе, общий кэш для них не нужен
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+SILENCED_SYSTEM_CHECKS = ['cinema.W001']
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+# Генератор создает тысячи пользователей, медленное хэширование паролей тут ни к чему
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+MEDIA_ROOT = os.environ.get('CINEMA_BENCH_MEDIA', os.path.join(BASE_DIR, 'media'))
+
+CINEMA_QUERY_BUDGET_STRICT = False
\ No newline at end of file
@@ -0,0 +1,42 @@
+# Профиль для тестов без MySQL и Redis:
+#   python manage.py test --settings=cinema_manager.settings_test
+# С основными settings тесты идут на MySQL, как в продакшене
+import tempfile
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            'timeout': 30,
+        },
+        # Тестовая база в файле, а не в памяти: потоки тестов конкурентной покупки
+        # ждут блокировку записи (timeout), а не получают "database table is locked"
+        'TEST': {
+            'NAME': os.path.join(tempfile.gettempdir(), 'cinema_test.sqlite3'),
+        },
+    },
+    # Отдельная база, а не зеркало default: тесты маршрутизации видят, в какую базу ушел запрос.
+    # Включается в тесте через override_settings(CINEMA_READ_REPLICA='replica')
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+        'TEST': {
+            'NAME': os.path.join(tempfile.gettempdir(), 'cinema_test_replica.sqlite3'),
+        },
+    },
+}
+
+# Тесты идут в одном процессе, общий кэш им не нужен
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+SILENCED_SYSTEM_CHECKS = ['cinema.W001']
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+MEDIA_ROOT = os.path.join(tempfile.gettempdir(), 'cinema_test_media')
+
+CINEMA_QUERY_BUDGET_STRICT = True